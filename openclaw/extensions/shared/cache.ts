@@ -0,0 +1,47 @@
+export type TtlCache<T> = {
+    get(key: string): T | undefined;
+    set(key: string, value: T): void;
+    delete(key: string): void;
+    clear(): void;
+    size(): number;
+};
+
+// In-memory LRU with per-entry expiry. Map iteration order doubles as recency order:
+// hits are re-inserted at the tail, evictions pop from the head.
+export function createTtlCache<T>(maxEntries: number, ttlMs: number | (() => number)): TtlCache<T> {
+    const entries = new Map<string, { value: T; expiresAt: number }>();
+    const resolveTtl = typeof ttlMs === "function" ? ttlMs : () => ttlMs;
+
+    return {
+        get(key: string): T | undefined {
+            const hit = entries.get(key);
+            if (!hit) {
+                return undefined;
+            }
+            entries.delete(key);
+            if (hit.expiresAt <= Date.now()) {
+                return undefined;
+            }
+            entries.set(key, hit);
+            return hit.value;
+        },
+        set(key: string, value: T): void {
+            entries.delete(key);
+            entries.set(key, { value, expiresAt: Date.now() + resolveTtl() });
+            while (entries.size > maxEntries) {
+                const oldest = entries.keys().next().value;
+                if (oldest === undefined) break;
+                entries.delete(oldest);
+            }
+        },
+        delete(key: string): void {
+            entries.delete(key);
+        },
+        clear(): void {
+            entries.clear();
+        },
+        size(): number {
+            return entries.size;
+        },
+    };
+}
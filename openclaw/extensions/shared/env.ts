@@ -2,12 +2,17 @@
  * 统一的环境变量加载模块
  * 支持从进程环境变量和 .env 文件中读取配置
  */
-import { existsSync, readFileSync, statSync } from "node:fs";
+import { existsSync, promises as fs, readFileSync, statSync } from "node:fs";
 import { homedir } from "node:os";
 import path from "node:path";
 
 let envCache: Record<string, string> | null = null;
 let envMtimeMs = -1;
+let envCheckedAt = 0;
+let envRefreshing: Promise<void> | null = null;
+
+// env() is called many times per message; only re-check the .env file this often.
+const ENV_RECHECK_MS = 5000;
 
 function resolveEnvFilePath(): string {
     const fromEnv = (process.env.XIAO_ENV_FILE || "").trim();
@@ -28,7 +33,61 @@ function unquoteEnvValue(value: string): string {
     return v;
 }
 
+function parseEnvContent(content: string): Record<string, string> {
+    const parsed: Record<string, string> = {};
+    for (const rawLine of content.split(/\r?\n/)) {
+        const line = rawLine.trim();
+        if (!line || line.startsWith("#")) {
+            continue;
+        }
+        const idx = line.indexOf("=");
+        if (idx <= 0) {
+            continue;
+        }
+        const key = line.slice(0, idx).trim();
+        const value = unquoteEnvValue(line.slice(idx + 1));
+        if (!key) {
+            continue;
+        }
+        parsed[key] = value;
+    }
+    return parsed;
+}
+
+// Later rechecks stat/read the file asynchronously and swap the cache in when done,
+// so env() callers on the message path never wait on disk after the first load.
+async function refreshEnvFile(): Promise<void> {
+    const file = resolveEnvFilePath();
+    try {
+        const stat = await fs.stat(file);
+        if (envMtimeMs === stat.mtimeMs) {
+            return;
+        }
+        const content = await fs.readFile(file, "utf8");
+        envCache = parseEnvContent(content);
+        envMtimeMs = stat.mtimeMs;
+    } catch {
+        envCache = {};
+        envMtimeMs = -1;
+    }
+}
+
 function loadEnvFile(): Record<string, string> {
+    const now = Date.now();
+    if (envCache && now - envCheckedAt < ENV_RECHECK_MS) {
+        return envCache;
+    }
+    envCheckedAt = now;
+
+    if (envCache) {
+        if (!envRefreshing) {
+            envRefreshing = refreshEnvFile().finally(() => {
+                envRefreshing = null;
+            });
+        }
+        return envCache;
+    }
+
     const file = resolveEnvFilePath();
     if (!existsSync(file)) {
         envCache = {};
@@ -38,32 +97,9 @@ function loadEnvFile(): Record<string, string> {
 
     try {
         const stat = statSync(file);
-        if (envCache && envMtimeMs === stat.mtimeMs) {
-            return envCache;
-        }
-
-        const content = readFileSync(file, "utf8");
-        const parsed: Record<string, string> = {};
-        for (const rawLine of content.split(/\r?\n/)) {
-            const line = rawLine.trim();
-            if (!line || line.startsWith("#")) {
-                continue;
-            }
-            const idx = line.indexOf("=");
-            if (idx <= 0) {
-                continue;
-            }
-            const key = line.slice(0, idx).trim();
-            const value = unquoteEnvValue(line.slice(idx + 1));
-            if (!key) {
-                continue;
-            }
-            parsed[key] = value;
-        }
-
-        envCache = parsed;
+        envCache = parseEnvContent(readFileSync(file, "utf8"));
         envMtimeMs = stat.mtimeMs;
-        return parsed;
+        return envCache;
     } catch {
         envCache = {};
         envMtimeMs = -1;
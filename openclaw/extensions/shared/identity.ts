@@ -3,6 +3,10 @@ import { env } from "./env.js";
 let userAliasMapCache: Map<string, string> | null = null;
 let lastAliasRaw = "";
 
+// The same user key is normalized by every store/alias call of a message; memoize the regex work.
+const NORMALIZED_USER_KEY_CACHE = new Map<string, string>();
+const NORMALIZED_USER_KEY_CACHE_MAX = 4096;
+
 export function getUserAliasMap(): Map<string, string> {
     const raw = (env("XIAO_USER_ALIAS_MAP") || env("XIAO_EMOTION_ALIAS_MAP") || "").trim();
     if (userAliasMapCache && lastAliasRaw === raw) {
@@ -67,7 +71,25 @@ export function resolveUserKeyFromOutbound(ctx: { channelId?: string; conversati
 }
 
 export function normalizeUserKey(raw: string): string {
-    const text = (raw || "").trim();
+    const key = raw || "";
+    const cached = NORMALIZED_USER_KEY_CACHE.get(key);
+    if (cached !== undefined) {
+        return cached;
+    }
+
+    const normalized = computeNormalizedUserKey(key);
+    if (NORMALIZED_USER_KEY_CACHE.size >= NORMALIZED_USER_KEY_CACHE_MAX) {
+        const oldest = NORMALIZED_USER_KEY_CACHE.keys().next().value;
+        if (oldest !== undefined) {
+            NORMALIZED_USER_KEY_CACHE.delete(oldest);
+        }
+    }
+    NORMALIZED_USER_KEY_CACHE.set(key, normalized);
+    return normalized;
+}
+
+function computeNormalizedUserKey(raw: string): string {
+    const text = raw.trim();
     if (!text) {
         return "session:unknown";
     }
@@ -1,4 +1,4 @@
-import { execFile } from "node:child_process";
+import { execFile, spawn } from "node:child_process";
 import { promisify } from "node:util";
 import { clamp, errToString } from "./text.js";
 import { env } from "./env.js";
@@ -6,12 +6,47 @@ import { env } from "./env.js";
 const execFileAsync = promisify(execFile);
 
 export function mediaMaxBytes(): number {
-    const v = env("XIAO_MEDIA_MAX_MB");
-    const mb = parseInt(v, 10);
-    if (Number.isFinite(mb) && mb > 0) {
-        return mb * 1024 * 1024;
+    // parseFloat accepts "20MB"-style values; anything unparsable falls back to 20 MB
+    // instead of leaking NaN through clamp and silently disabling the size cap.
+    const parsed = Number.parseFloat(env("XIAO_MEDIA_MAX_MB"));
+    const mb = Number.isFinite(parsed) ? clamp(parsed, 1, 200) : 20;
+    return Math.trunc(mb * 1024 * 1024);
+}
+
+export function htmlMaxBytes(): number {
+    const v = env("XIAO_HTML_MAX_KB");
+    const kb = parseInt(v, 10);
+    if (Number.isFinite(kb) && kb > 0) {
+        return kb * 1024;
     }
-    return 20 * 1024 * 1024;
+    return 512 * 1024;
+}
+
+// Read a response body as UTF-8 text but stop after maxBytes, so huge pages never get fully buffered.
+export async function readTextCapped(res: Response, maxBytes: number): Promise<string> {
+    if (!res.body) {
+        return "";
+    }
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let received = 0;
+    let text = "";
+    try {
+        while (received < maxBytes) {
+            const { done, value } = await reader.read();
+            if (done || !value) {
+                break;
+            }
+            const room = maxBytes - received;
+            const chunk = value.byteLength > room ? value.subarray(0, room) : value;
+            received += chunk.byteLength;
+            text += decoder.decode(chunk, { stream: true });
+        }
+        text += decoder.decode();
+    } finally {
+        reader.cancel().catch(() => undefined);
+    }
+    return text;
 }
 
 export async function fetchJson(url: string, init?: RequestInit, timeoutMs: number = 12000): Promise<unknown> {
@@ -33,6 +68,46 @@ export async function fetchJson(url: string, init?: RequestInit, timeoutMs: numb
     }
 }
 
+// Cap concurrent curl subprocesses per host: a burst of tool calls against one site
+// queues here instead of spawning a process per request and tripping its rate limits.
+const CURL_MAX_PER_HOST = 4;
+const CURL_HOST_SLOTS = new Map<string, { active: number; waiters: Array<() => void> }>();
+
+async function withCurlHostSlot<T>(url: string, fn: () => Promise<T>): Promise<T> {
+    let host = "";
+    try {
+        host = new URL(url).host;
+    } catch {
+        host = "";
+    }
+    let slot = CURL_HOST_SLOTS.get(host);
+    if (!slot) {
+        slot = { active: 0, waiters: [] };
+        CURL_HOST_SLOTS.set(host, slot);
+    }
+    if (slot.active >= CURL_MAX_PER_HOST) {
+        const queued = slot;
+        await new Promise<void>((resolve) => queued.waiters.push(resolve));
+    } else {
+        slot.active += 1;
+    }
+
+    try {
+        return await fn();
+    } finally {
+        const next = slot.waiters.shift();
+        if (next) {
+            // Hand the slot straight to the next waiter; active stays the same.
+            next();
+        } else {
+            slot.active -= 1;
+            if (slot.active === 0) {
+                CURL_HOST_SLOTS.delete(host);
+            }
+        }
+    }
+}
+
 export async function fetchJsonByCurl(params: {
     url: string;
     timeoutSec?: number;
@@ -51,7 +126,7 @@ export async function fetchJsonByCurl(params: {
     args.push(params.url);
 
     try {
-        const { stdout } = await execFileAsync("curl", args, {
+        const { stdout } = await withCurlHostSlot(params.url, () => execFileAsync("curl", args, {
             timeout: timeoutSec * 1000 + 3000,
             maxBuffer: 8 * 1024 * 1024,
             env: {
@@ -63,7 +138,7 @@ export async function fetchJsonByCurl(params: {
                 https_proxy: proxy || "",
                 all_proxy: proxy || "",
             },
-        });
+        }));
         const text = (stdout || "").trim();
         if (!text) {
             return {};
@@ -86,6 +161,8 @@ export async function fetchTextByCurl(params: {
     proxy?: string;
     headers?: Record<string, string>;
     compressed?: boolean;
+    // Stop reading (and kill curl) after this many bytes of body; the truncated prefix is returned.
+    maxBytes?: number;
 }): Promise<string> {
     const timeoutSec = clamp(Number(params.timeoutSec || 20), 3, 120);
     const args: string[] = ["-sS", "-L", "--fail-with-body", "--max-time", String(timeoutSec)];
@@ -101,21 +178,29 @@ export async function fetchTextByCurl(params: {
     }
     args.push(params.url);
 
+    const options = {
+        timeout: timeoutSec * 1000 + 3000,
+        maxBuffer: 8 * 1024 * 1024,
+        env: {
+            ...process.env,
+            HTTP_PROXY: proxy || "",
+            HTTPS_PROXY: proxy || "",
+            ALL_PROXY: proxy || "",
+            http_proxy: proxy || "",
+            https_proxy: proxy || "",
+            all_proxy: proxy || "",
+        },
+    };
+    const maxBytes = Number(params.maxBytes || 0);
+
     try {
-        const { stdout } = await execFileAsync("curl", args, {
-            timeout: timeoutSec * 1000 + 3000,
-            maxBuffer: 8 * 1024 * 1024,
-            env: {
-                ...process.env,
-                HTTP_PROXY: proxy || "",
-                HTTPS_PROXY: proxy || "",
-                ALL_PROXY: proxy || "",
-                http_proxy: proxy || "",
-                https_proxy: proxy || "",
-                all_proxy: proxy || "",
-            },
+        return await withCurlHostSlot(params.url, async () => {
+            if (maxBytes > 0) {
+                return runCurlCapped(args, options, maxBytes);
+            }
+            const { stdout } = await execFileAsync("curl", args, options);
+            return String(stdout || "");
         });
-        return String(stdout || "");
     } catch (err) {
         const e = err as Error & { stdout?: string; stderr?: string };
         const msg = `${(e.stderr || "").trim()} ${(e.stdout || "").trim()}`.trim() || errToString(err);
@@ -123,6 +208,56 @@ export async function fetchTextByCurl(params: {
     }
 }
 
+// Like execFile("curl") but keeps at most maxBytes of stdout: once the cap is reached curl is killed, so an
+// oversized page is cut off mid-transfer instead of being downloaded in full and sliced afterwards.
+// (curl's --max-filesize would reject such pages outright rather than return their prefix.)
+function runCurlCapped(
+    args: string[],
+    options: { timeout: number; env: NodeJS.ProcessEnv },
+    maxBytes: number,
+): Promise<string> {
+    return new Promise((resolve, reject) => {
+        const child = spawn("curl", args, { env: options.env, stdio: ["ignore", "pipe", "pipe"] });
+        const chunks: Buffer[] = [];
+        let received = 0;
+        let capped = false;
+        let stderr = "";
+        const timer = setTimeout(() => child.kill("SIGKILL"), options.timeout);
+
+        child.stdout.on("data", (chunk: Buffer) => {
+            if (capped) {
+                return;
+            }
+            const room = maxBytes - received;
+            const part = chunk.byteLength > room ? chunk.subarray(0, room) : chunk;
+            chunks.push(part);
+            received += part.byteLength;
+            if (received >= maxBytes) {
+                capped = true;
+                child.kill("SIGTERM");
+            }
+        });
+        child.stderr.on("data", (chunk: Buffer) => {
+            if (stderr.length < 2000) {
+                stderr += chunk.toString("utf8");
+            }
+        });
+        child.on("error", (err) => {
+            clearTimeout(timer);
+            reject(err);
+        });
+        child.on("close", (code, signal) => {
+            clearTimeout(timer);
+            const stdout = Buffer.concat(chunks).toString("utf8");
+            if (capped || code === 0) {
+                resolve(stdout);
+                return;
+            }
+            reject(Object.assign(new Error(`curl exited with ${code ?? signal}`), { stdout, stderr }));
+        });
+    });
+}
+
 export async function fetchBytes(
     url: string,
     init?: RequestInit,
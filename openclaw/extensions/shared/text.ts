@@ -27,19 +27,26 @@ export function errToString(err: unknown): string {
     return String(err);
 }
 
+// Internal tags and media markup that never belong in a user-visible reply. Shared with
+// sanitizeAssistantOutbound in xiao-core so both strippers stay in sync. The fragments start with
+// distinct prefixes, so their order inside the alternation does not change what gets removed.
+export const REPLY_MARKUP_PATTERN_SOURCES: readonly string[] = [
+    /\[MOOD_CHANGE[:：]\s*-?\d+\s*\]/.source,
+    /\[UPDATE_PROFILE[:：]\s*[^\]]+\]/.source,
+    /<qqvoice>[\s\S]*?<\/qqvoice>/.source,
+    /<qqimg>[\s\S]*?<\/qqimg>/.source,
+    /<img\b[^>]*>/.source,
+    /!\[[^\]]*]\((?:file|https?):\/\/[^)]+\)/.source,
+    /\[\[\s*audio_as_voice\s*]\]/.source,
+];
+
+// Lingering thought tags are removed in their own pass first, so a thought block is dropped whole
+// together with any markup inside it. Only then is the markup alternation applied in one scan.
+// With overlapping tags this is not the old per-pattern order: "text<think>a<qqimg>b</think>c</qqimg>"
+// now becomes "textc</qqimg>" (the old chain stripped the <qqimg> pair first and gave "text<think>a").
+const THOUGHT_STRIP_RE = /<memo>[\s\S]*?<\/memo>|<rethink>[\s\S]*?<\/rethink>|<think>[\s\S]*?<\/think>/gi;
+const ASSISTANT_STRIP_RE = new RegExp(REPLY_MARKUP_PATTERN_SOURCES.join("|"), "gi");
+
 export function cleanAssistantText(text: string): string {
-    let cleaned = (text || "").trim();
-    cleaned = cleaned.replace(/\[MOOD_CHANGE[:：]\s*-?\d+\s*\]/gi, "");
-    cleaned = cleaned.replace(/\[UPDATE_PROFILE[:：]\s*[^\]]+\]/gi, "");
-    cleaned = cleaned.replace(/<qqvoice>[\s\S]*?<\/qqvoice>/gi, "");
-    cleaned = cleaned.replace(/<qqimg>[\s\S]*?<\/qqimg>/gi, "");
-    cleaned = cleaned.replace(/<img\b[^>]*>/gi, "");
-    cleaned = cleaned.replace(/!\[[^\]]*]\((?:file|https?):\/\/[^)]+\)/gi, "");
-    cleaned = cleaned.replace(/\[\[\s*audio_as_voice\s*]\]/gi, "");
-    cleaned = cleaned.replace(/\s+$/g, "");
-    // Clean potentially lingering thought tags
-    cleaned = cleaned.replace(/<[Mm]emo>[\s\S]*?<\/[Mm]emo>/g, "");
-    cleaned = cleaned.replace(/<[Rr]ethink>[\s\S]*?<\/[Rr]ethink>/g, "");
-    cleaned = cleaned.replace(/<think>[\s\S]*?<\/think>/g, "");
-    return cleaned.trim();
+    return (text || "").replace(THOUGHT_STRIP_RE, "").replace(ASSISTANT_STRIP_RE, "").trim();
 }
@@ -1,7 +1,10 @@
 import type { OpenClawPluginApi } from "openclaw/plugin-sdk";
 import { clamp, shorten } from "../../shared/text.js";
+import { createTtlCache } from "../../shared/cache.js";
 import { fetchTextWithTimeout, stripHtmlToText } from "./url-basic-command.js";
 
+const TRENDING_SINCE = new Set(["daily", "weekly", "monthly"]);
+
 export type GithubTrendingLiteItem = {
   repo: string;
   description: string;
@@ -15,6 +18,9 @@ export type GithubRepoMeta = {
   language: string;
 };
 
+// 热榜页面一小时内基本不变，同一 since/language/limit 的抓取结果短时间内复用，不再重复拉整页
+const TRENDING_LITE_CACHE = createTtlCache<GithubTrendingLiteItem[]>(32, 15 * 60 * 1000);
+
 export async function fetchGithubTrendingLite(params: {
   since: "daily" | "weekly" | "monthly";
   limit: number;
@@ -23,6 +29,12 @@ export async function fetchGithubTrendingLite(params: {
   const since = params.since;
   const limit = clamp(Number(params.limit || 5), 1, 10);
   const language = (params.language || "").trim();
+  const cacheKey = `${since}|${language.toLowerCase()}|${limit}`;
+  const cached = TRENDING_LITE_CACHE.get(cacheKey);
+  if (cached) {
+    return cached;
+  }
+
   const base = language
     ? `https://github.com/trending/${encodeURIComponent(language)}`
     : "https://github.com/trending";
@@ -61,6 +73,9 @@ export async function fetchGithubTrendingLite(params: {
       stars,
     });
   }
+  if (out.length > 0) {
+    TRENDING_LITE_CACHE.set(cacheKey, out);
+  }
   return out;
 }
 
@@ -77,7 +92,7 @@ export function registerXiaoGithubCommand(api: OpenClawPluginApi): void {
 
       // 提取时间跨度参数（默认为 weekly）
       const sinceToken = (tokens[0] || "weekly").toLowerCase();
-      const since = (["daily", "weekly", "monthly"].includes(sinceToken) ? sinceToken : "weekly") as
+      const since = (TRENDING_SINCE.has(sinceToken) ? sinceToken : "weekly") as
         | "daily"
         | "weekly"
         | "monthly";
@@ -1,6 +1,7 @@
 import type { OpenClawPluginApi } from "openclaw/plugin-sdk";
 import { clamp, shorten } from "../../shared/text.js";
 import { applyAlias, normalizeUserKey } from "../../shared/identity.js";
+import { createTtlCache } from "../../shared/cache.js";
 import {
   fetchGithubTrendingLite,
   type GithubRepoMeta,
@@ -40,11 +41,18 @@ export function inferGithubUseHint(item: GithubTrendingLiteItem, meta: GithubRep
   return "适合先看它的 README 和示例，再决定是不是要接到你自己的项目里。";
 }
 
+// 仓库简介/topics 很少变动，周榜重发或换语言重查时同一仓库不必再抓一次主页；抓取失败的空结果不缓存
+const REPO_META_CACHE = createTtlCache<GithubRepoMeta>(256, 60 * 60 * 1000);
+
 export async function fetchGithubRepoMeta(repo: string): Promise<GithubRepoMeta> {
   const cleanRepo = (repo || "").trim().replace(/^\/+|\/+$/g, "");
   if (!cleanRepo || !cleanRepo.includes("/")) {
     return { description: "", topics: [], language: "" };
   }
+  const cached = REPO_META_CACHE.get(cleanRepo.toLowerCase());
+  if (cached) {
+    return cached;
+  }
   try {
     const html = await fetchTextWithTimeout(`https://github.com/${cleanRepo}`, 12000, {
       "User-Agent":
@@ -78,7 +86,9 @@ export async function fetchGithubRepoMeta(repo: string): Promise<GithubRepoMeta>
         break;
       }
     }
-    return { description: desc, topics, language };
+    const meta = { description: desc, topics, language };
+    REPO_META_CACHE.set(cleanRepo.toLowerCase(), meta);
+    return meta;
   } catch {
     return { description: "", topics: [], language: "" };
   }
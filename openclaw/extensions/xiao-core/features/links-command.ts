@@ -28,8 +28,8 @@ export function registerXiaoLinksCommand(api: OpenClawPluginApi): void {
         return { text: "no recent links" };
       }
 
-      // 按照时间戳倒序排序，保证最新的记录展示在最前面
-      const latestFirst = links.slice().sort((a, b) => Number(b.ts || 0) - Number(a.ts || 0));
+      // getRecentLinks 按写入顺序（旧→新）返回，反转写入顺序即可让最新的记录展示在最前面
+      const latestFirst = links.reverse();
 
       // 构建展示的富文本列表
       const lines: string[] = [];
@@ -3,6 +3,19 @@ import { applyAlias, normalizeUserKey } from "../../shared/identity.js";
 import { getRecentMemos, addMemoEntry, searchMemos, deleteMemoEntry } from "../state/store.js";
 import { shorten } from "../../shared/text.js";
 
+// 列表里每条备忘都要格式化时间，复用同一个格式化器，避免每条 toLocaleString 都重新解析区域/时区数据。
+// 显式列出年月日时分秒，输出与 toLocaleString("zh-CN", { hour12: false }) 一致。
+const MEMO_TIME_FORMAT = new Intl.DateTimeFormat("zh-CN", {
+  year: "numeric",
+  month: "numeric",
+  day: "numeric",
+  hour: "numeric",
+  minute: "numeric",
+  second: "numeric",
+  hour12: false,
+  timeZone: "Asia/Shanghai",
+});
+
 export function registerXiaoMemoCommand(api: OpenClawPluginApi): void {
   // 注册 /xiao-memo 命令，用于管理个人的短文本备忘录
   api.registerCommand({
@@ -34,7 +47,7 @@ export function registerXiaoMemoCommand(api: OpenClawPluginApi): void {
         for (let i = list.length - 1; i >= 0; i -= 1) {
           const item = list[i];
           if (!item) continue;
-          const at = new Date(item.ts).toLocaleString("zh-CN", { hour12: false, timeZone: "Asia/Shanghai" });
+          const at = MEMO_TIME_FORMAT.format(item.ts);
           const tags = item.tags.length > 0 ? ` #${item.tags.join(" #")}` : "";
           lines.push(`${rank}. [${at}] ${shorten(item.text, 120)}${tags} (id=${item.id})`);
           rank++;
@@ -73,7 +86,7 @@ export function registerXiaoMemoCommand(api: OpenClawPluginApi): void {
         const lines: string[] = [];
         lines.push(`飞飞，和「${shorten(q, 24)}」相关的备忘有：`);
         rows.forEach((x, i) => {
-          const at = new Date(x.ts).toLocaleString("zh-CN", { hour12: false, timeZone: "Asia/Shanghai" });
+          const at = MEMO_TIME_FORMAT.format(x.ts);
           lines.push(`${i + 1}. [${at}] ${shorten(x.text, 100)} (id=${x.id})`);
         });
         return { text: lines.join("\n") };
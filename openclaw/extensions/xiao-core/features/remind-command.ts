@@ -17,22 +17,6 @@ export function parseReminderArgs(text: string): { minutes: number; content: str
   return { minutes, content };
 }
 
-export function parseReminderIntent(input: string): { minutes: number; content: string } | null {
-  const t = (input || "").trim();
-  const m = t.match(/^(?:帮我|让我)?(\d+(?:\.\d+)?)(?:个|分钟)?(?:小时)?(?:之后|以后(?:提醒我)?)(.+)$/);
-  if (!m) return null;
-
-  let num = Number(m[1]);
-  if (!Number.isFinite(num)) return null;
-
-  if (t.includes("小时")) {
-    num *= 60;
-  }
-  const content = (m[2] || "").replace(/^(的?时候|再的?)|(告诉我|提醒我)/g, "").trim();
-  if (num <= 0 || !content) return null;
-  return { minutes: num, content };
-}
-
 export function reminderTargetFromUserKey(userKey: string): string | null {
   const normalized = (userKey || "").trim();
   if (!normalized || normalized === "session:unknown") return null;
@@ -70,16 +54,42 @@ export function resolveQqTargetFromCtx(ctx: {
   return null;
 }
 
+// 从第一个 { 或 [ 开始按括号深度线性扫描，找到与之配对的收尾位置（跳过字符串内的括号）
+function balancedJsonSlice(t: string): string | null {
+  const brace = t.indexOf("{");
+  const bracket = t.indexOf("[");
+  const start = brace < 0 ? bracket : bracket < 0 ? brace : Math.min(brace, bracket);
+  if (start < 0) return null;
+
+  let depth = 0;
+  let inString = false;
+  for (let i = start; i < t.length; i += 1) {
+    const ch = t[i];
+    if (inString) {
+      if (ch === "\\") i += 1;
+      else if (ch === "\"") inString = false;
+      continue;
+    }
+    if (ch === "\"") inString = true;
+    else if (ch === "{" || ch === "[") depth += 1;
+    else if (ch === "}" || ch === "]") {
+      depth -= 1;
+      if (depth === 0) return t.slice(start, i + 1);
+    }
+  }
+  return null;
+}
+
 export function extractJsonPayload(text: string): unknown {
   const t = (text || "").trim();
   if (!t) return {};
   try {
     return JSON.parse(t);
   } catch {
-    const m = t.match(/\{[\s\S]*\}|\[[\s\S]*\]/);
-    if (m) {
+    const slice = balancedJsonSlice(t);
+    if (slice) {
       try {
-        return JSON.parse(m[0]);
+        return JSON.parse(slice);
       } catch {
         return {};
       }
@@ -27,8 +27,8 @@ export function registerXiaoSourceCommand(api: OpenClawPluginApi): void {
         return { text: "飞飞，我这边还没有可引用的来源链接记录，你再发我一次原链接吧。" };
       }
 
-      // 按时间戳倒排以便先看最新出现的引用
-      const latestFirst = links.slice().sort((a, b) => Number(b.ts || 0) - Number(a.ts || 0));
+      // getRecentLinks 按写入顺序（旧→新）返回，反转写入顺序以便先看最新出现的引用
+      const latestFirst = links.reverse();
 
       // 构造无大段摘要版本的纯纯链接列表展示
       const lines: string[] = [];
@@ -1,26 +1,31 @@
 import type { OpenClawPluginApi } from "openclaw/plugin-sdk";
 import { shorten } from "../../shared/text.js";
+import { htmlMaxBytes, readTextCapped } from "../../shared/request.js";
 import { extractUrls } from "../utils/media.js";
 
+// 正文抽取每抓一个链接都要跑一遍：正则与实体表在模块加载时建好，脚本/样式块合成一次扫描。
+const HTML_ENTITY_RE = /&(nbsp|amp|lt|gt|quot|#39);/gi;
+const HTML_ENTITY_MAP: Record<string, string> = {
+  nbsp: " ",
+  amp: "&",
+  lt: "<",
+  gt: ">",
+  quot: "\"",
+  "#39": "'",
+};
+const NON_TEXT_BLOCK_RE = /<(script|style|noscript)[\s\S]*?<\/\1>/gi;
+const HTML_TAG_RE = /<[^>]+>/g;
+const WHITESPACE_RE = /\s+/g;
+
 export function decodeHtmlEntities(text: string): string {
   if (!text) return "";
-  return text
-    .replace(/&nbsp;/gi, " ")
-    .replace(/&amp;/gi, "&")
-    .replace(/&lt;/gi, "<")
-    .replace(/&gt;/gi, ">")
-    .replace(/&quot;/gi, "\"")
-    .replace(/&#39;/gi, "'");
+  return text.replace(HTML_ENTITY_RE, (m, name: string) => HTML_ENTITY_MAP[name.toLowerCase()] ?? m);
 }
 
 export function stripHtmlToText(html: string): string {
   if (!html) return "";
-  const noScript = html
-    .replace(/<script[\s\S]*?<\/script>/gi, " ")
-    .replace(/<style[\s\S]*?<\/style>/gi, " ")
-    .replace(/<noscript[\s\S]*?<\/noscript>/gi, " ");
-  const plain = noScript.replace(/<[^>]+>/g, " ");
-  return decodeHtmlEntities(plain).replace(/\s+/g, " ").trim();
+  const plain = html.replace(NON_TEXT_BLOCK_RE, " ").replace(HTML_TAG_RE, " ");
+  return decodeHtmlEntities(plain).replace(WHITESPACE_RE, " ").trim();
 }
 
 export async function fetchTextWithTimeout(
@@ -33,7 +38,7 @@ export async function fetchTextWithTimeout(
     const t = await res.text().catch(() => "");
     throw new Error(`HTTP ${res.status}: ${shorten(t, 160)}`);
   }
-  return await res.text();
+  return await readTextCapped(res, htmlMaxBytes());
 }
 
 export function normalizeHttpUrl(input: string): string | null {
@@ -2,23 +2,34 @@ import type { OpenClawPluginApi } from "openclaw/plugin-sdk";
 import { shorten } from "../../shared/text.js";
 import { fetchJson } from "../../shared/request.js";
 
+// 先取紧挨着天气词的那一段汉字，再只从两端剥掉口语前缀和时间词，剩下的才当城市。
+// 填充词只在首尾按整词剥离：“会”“要”“的”之类的单字若出现在中间（如“会同”“要塞”）不能被删掉。
+// 时间词两端都可能出现，因此首尾两个正则都要带上；长词排在短词前（“查询”先于“查”）。
+// 例：“北京今天天气”“我想知道北京天气”“今天北京天气”“这周北京天气”“广州下周天气”“查询北京天气” → 北京/广州；
+// “明天上海会下雨吗” → 上海；“今天天气”“你那边天气” → 不是城市。
+const CITY_WEATHER_RE = /([\p{Script=Han}]{2,})(?:天气|气温|温度|下雨|降雨|冷不冷|热不热)/u;
+const CITY_TIME_WORDS = "这几天|这两天|最近|今天|明天|后天|现在|这周|下周|本周";
+const CITY_LEADING_FILLER_RE = new RegExp(
+  `^(?:帮我|麻烦|请问|请|我想|想|知道|告诉我|查一下|查询|查查|查|看看|看|问问|问|一下|${CITY_TIME_WORDS})+`,
+  "u",
+);
+const CITY_TRAILING_FILLER_RE = new RegExp(`(?:${CITY_TIME_WORDS}|会不会|会|要|的)+$`, "u");
+// 人称代词开头或带“这边/那里/附近”这类方位指代的不是城市，如“你那边”“我们这里”。
+const CITY_NON_PLACE_RE = /^[我你他她它咱]|[这那哪](?:边|里|儿)|外面|附近|本地|当地|家里/u;
+const CITY_STOPWORDS = new Set(["这里", "那里", "这边", "那边", "外面", "我们", "你们", "我这", "你那"]);
+
 export function inferCityFromInput(input: string): string | null {
   const text = (input || "").trim();
   if (!text) {
     return null;
   }
 
-  const m1 = text.match(/(?:查|看|问|告诉我|知道|今天|明天|后天|现在)?([\p{Script=Han}]{2,8})(?:天气|气温|温度|下雨|降雨)/u);
-  if (m1?.[1]) {
-    return m1[1];
-  }
-
-  const m2 = text.match(/([\p{Script=Han}]{2,8})(?:今天|明天|后天)?(?:冷不冷|热不热)/u);
-  if (m2?.[1]) {
-    return m2[1];
+  const m = text.match(CITY_WEATHER_RE);
+  const city = (m?.[1] || "").replace(CITY_TRAILING_FILLER_RE, "").replace(CITY_LEADING_FILLER_RE, "");
+  if (city.length < 2 || city.length > 8 || CITY_STOPWORDS.has(city) || CITY_NON_PLACE_RE.test(city)) {
+    return null;
   }
-
-  return null;
+  return city;
 }
 
 export function weatherCodeToText(code: number): string {
@@ -1,30 +1,14 @@
 import type { OpenClawPluginApi, AnyAgentTool } from "openclaw/plugin-sdk";
-import { applyAlias, normalizeUserKey } from "../shared/identity.js";
-import { clamp, shorten } from "../shared/text.js";
+import { applyAlias, inferRecipientId, normalizeUserKey, resolveUserKeyFromPrompt } from "../shared/identity.js";
+import { clamp, cleanAssistantText, shorten } from "../shared/text.js";
 import { envStatus } from "../shared/env.js";
 import { assertAllowedChannel } from "../shared/channel.js";
 
 // Core utils/state imports
-import { inferRecipientId, resolveUserKeyFromPrompt } from "./utils/intent.js";
-import {
-  hasWeatherIntent,
-  hasStockIntent,
-  hasGithubTrendingIntent,
-  hasUrlSummaryIntent,
-  hasSourceFollowupIntent,
-  parseReminderIntent,
-  detectGreetingType,
-  extractPlanIntent,
-  hasHabitIntent,
-  hasDiaryIntent,
-  hasGameIntent,
-  hasMusicIntent,
-  hasMovieIntent,
-  hasRestaurantIntent,
-  hasExpressIntent,
-} from "./utils/intent.js";
+import { detectInputIntents, isLikelyAttachmentOnlyInput } from "./utils/intent.js";
 import {
   extractUrls,
+  classifyUrlHost,
   extractImageRefs,
   extractAudioRefs,
   getPendingUrl,
@@ -34,29 +18,30 @@ import {
   setPendingImage,
   clearPendingImage,
   sweepPendingImageCache,
-  isLikelyAttachmentOnlyInput,
 } from "./utils/media.js";
 import { loadPersonaPrompt, resolvePersonaPromptFilePath } from "./state/persona.js";
 import {
   SESSION_USER_MAP,
+  rememberSession,
   sweepSessionCache,
   formatUptimeSec,
   resolveStateFilePath,
-  addMemoryNote,
-  addChatEntry,
+  recordUserTurn,
+  recordAssistantTurn,
   getRecentNotes,
   getRecentChats,
-  addLinkEvidence,
   getRecentLinks,
   retrieveRagHits,
   runDailyReflection,
   getUserPersona,
+  flushPendingPersist,
+  installPersistExitHooks,
+  setPersistErrorLogger,
 } from "./state/store.js";
 import {
   extractUserInput,
   extractExplicitMemory,
   sanitizeAssistantOutbound,
-  cleanAssistantText,
 } from "./utils/text.js";
 import { transcribeAudioPathForContext } from "./utils/audio.js";
 
@@ -90,6 +75,37 @@ function emptyPluginConfigSchema() {
   };
 }
 
+// 各类会话/待确认缓存的读取路径本身会校验 TTL，清理只为回收内存，不必每条消息都全量遍历
+const CACHE_SWEEP_INTERVAL_MS = 30_000;
+let lastCacheSweepAt = 0;
+
+function maybeSweepCaches(now: number): void {
+  if (now - lastCacheSweepAt < CACHE_SWEEP_INTERVAL_MS) {
+    return;
+  }
+  lastCacheSweepAt = now;
+  sweepSessionCache(now);
+  sweepPendingUrlCache(now);
+  sweepPendingImageCache(now);
+}
+
+// 角色提示行只依赖 persona_key，提到模块级做一次查表，不在每条消息里走 if/else 链
+const PERSONA_ROLE_LINES: Record<string, string> = {
+  big_sister: "当前角色：知性大姐姐。语气温柔成熟，减少撒娇。",
+  bestie: "当前角色：闺蜜。语气更直率，允许轻度吐槽但不攻击用户。",
+  little_sister: "当前角色：可爱妹妹。语气活泼简短，适度撒娇。",
+};
+const DEFAULT_PERSONA_ROLE_LINE = "当前角色：默认小a亲密陪伴模式。";
+
+// Token 优化配置：只读进程环境变量（不走 .env 热加载），进程生命周期内不变，模块加载时解析一次
+const CONTEXT_MAX_NOTES = parseInt(process.env.XIAO_MAX_NOTES || "3", 10);
+const CONTEXT_MAX_CHATS = parseInt(process.env.XIAO_MAX_CHATS || "4", 10);
+const CONTEXT_MAX_RAG_HITS = parseInt(process.env.XIAO_MAX_RAG_HITS || "3", 10);
+const CONTEXT_ENABLE_PREFETCH = process.env.XIAO_ENABLE_PREFETCH !== "false";
+const REPLY_MAX_CHARS = parseInt(process.env.XIAO_REPLY_MAX_CHARS || "90", 10);
+const BOUNDED_REPLY_MAX_CHARS = Number.isFinite(REPLY_MAX_CHARS) ? Math.min(Math.max(REPLY_MAX_CHARS, 40), 220) : 90;
+const REPLY_BUDGET_LINE = `回复预算：默认2-3行、尽量不超过${BOUNDED_REPLY_MAX_CHARS}字；保留亲密口吻但避免冗长寒暄。`;
+
 const jsonResult = (data: unknown) => {
   return typeof data === "string" ? data : JSON.stringify(data);
 };
@@ -132,125 +148,111 @@ const xiaoCorePlugin = {
   description: "Core migration helpers for OpenClaw QQ channel cutover",
   configSchema: emptyPluginConfigSchema(),
   register(api: OpenClawPluginApi) {
+    // 延迟写盘的失败走宿主日志；网关停止与进程退出时把未落盘的状态刷出去。
+    setPersistErrorLogger((message) => api.logger.warn(message));
+    installPersistExitHooks();
+    api.on("gateway_stop", async () => {
+      await flushPendingPersist();
+    });
+
     api.on("before_agent_start", async (event, ctx) => {
       const channelCheck = assertAllowedChannel(ctx.channel);
       if (!channelCheck.ok) {
         throw new Error(`xiao-core blocked request: ${channelCheck.reason}`);
       }
 
-      const now = Date.now();
-      sweepSessionCache(now);
-      sweepPendingUrlCache(now);
-      sweepPendingImageCache(now);
-      const personaPrompt = await loadPersonaPrompt();
+      const now = Date.now();
+      maybeSweepCaches(now);
 
       const prompt = event.prompt || "";
       const rawUserKey = resolveUserKeyFromPrompt(prompt, ctx.sessionKey);
       const mapped = applyAlias(rawUserKey);
       const userInput = extractUserInput(prompt);
       const audioRefs = extractAudioRefs(prompt);
-      const voiceTranscript =
-        audioRefs.length > 0 ? await transcribeAudioPathForContext(audioRefs[0] || "") : null;
+
+      // ASR 转写耗时最长，人设/笔记/近期对话不依赖转写结果，和它并行读取。
+      const [voiceTranscript, personaPrompt, recentNotes, recentChats, personaKey] = await Promise.all([
+        audioRefs.length > 0 ? transcribeAudioPathForContext(audioRefs[0] || "") : Promise.resolve(null),
+        loadPersonaPrompt(),
+        getRecentNotes(mapped.resolved, CONTEXT_MAX_NOTES),
+        getRecentChats(mapped.resolved, CONTEXT_MAX_CHATS),
+        getUserPersona(mapped.resolved),
+      ]);
       const effectiveUserInput =
         voiceTranscript && (isLikelyAttachmentOnlyInput(userInput) || userInput.length < 8)
           ? voiceTranscript
           : userInput;
 
       if (ctx.sessionKey) {
-        SESSION_USER_MAP.set(ctx.sessionKey, {
+        rememberSession(ctx.sessionKey, {
           resolvedUserKey: mapped.resolved,
           aliasFrom: mapped.aliasFrom,
           seenAt: now,
           promptPreview: shorten(prompt, 120),
           userInput: effectiveUserInput,
-          userInputRecorded: !!effectiveUserInput,
         });
       }
 
-      // Token 优化配置
-      const maxNotes = parseInt(process.env.XIAO_MAX_NOTES || "3", 10);
-      const maxChats = parseInt(process.env.XIAO_MAX_CHATS || "4", 10);
-      const maxRagHits = parseInt(process.env.XIAO_MAX_RAG_HITS || "3", 10);
-      const enablePrefetch = process.env.XIAO_ENABLE_PREFETCH !== "false";
-
-      const recentNotes = await getRecentNotes(mapped.resolved, maxNotes);
-      const recentChats = await getRecentChats(mapped.resolved, maxChats);
-      const ragHits = effectiveUserInput ? await retrieveRagHits(mapped.resolved, effectiveUserInput, maxRagHits) : [];
       const explicitMemo = extractExplicitMemory(effectiveUserInput);
-      const reminderIntent = parseReminderIntent(effectiveUserInput);
-      const greetingType = detectGreetingType(effectiveUserInput);
-      const planIntent = extractPlanIntent(effectiveUserInput);
-      const habitIntent = hasHabitIntent(effectiveUserInput);
-      const diaryIntent = hasDiaryIntent(effectiveUserInput);
-      const gameIntent = hasGameIntent(effectiveUserInput);
-      const musicIntent = hasMusicIntent(effectiveUserInput);
-      const movieIntent = hasMovieIntent(effectiveUserInput);
-      const restaurantIntent = hasRestaurantIntent(effectiveUserInput);
-      const expressIntent = hasExpressIntent(effectiveUserInput);
-      const weatherIntent = hasWeatherIntent(effectiveUserInput);
-      const stockIntent = hasStockIntent(effectiveUserInput);
-      const githubIntent = hasGithubTrendingIntent(effectiveUserInput);
-      const summaryIntent = hasUrlSummaryIntent(effectiveUserInput);
-      const sourceIntent = hasSourceFollowupIntent(effectiveUserInput);
+      const {
+        reminder: reminderIntent,
+        greeting: greetingType,
+        plan: planIntent,
+        habit: habitIntent,
+        diary: diaryIntent,
+        game: gameIntent,
+        music: musicIntent,
+        movie: movieIntent,
+        restaurant: restaurantIntent,
+        express: expressIntent,
+        weather: weatherIntent,
+        stock: stockIntent,
+        githubTrending: githubIntent,
+        urlSummary: summaryIntent,
+        sourceFollowup: sourceIntent,
+      } = detectInputIntents(effectiveUserInput);
+      const weatherCity = weatherIntent ? inferCityFromInput(effectiveUserInput) : null;
+      const stockSymbol = stockIntent ? inferStockSymbol(effectiveUserInput) : null;
+
+      // 天气/股票预取是外部网络请求，意图一确定就先发出，与下面的 RAG 检索、链接入库等本地步骤并行。
+      // 两个 fetch*Summary 内部已兜底返回 null，不会产生未处理的 rejection。
+      const prefetchTask: Promise<[string | null, string | null]> = CONTEXT_ENABLE_PREFETCH
+        ? Promise.all([
+          weatherCity ? fetchWeatherSummary(weatherCity) : Promise.resolve(null),
+          stockSymbol ? fetchStockSummary(stockSymbol) : Promise.resolve(null),
+        ])
+        : Promise.resolve([null, null]);
+
+      const ragHits = effectiveUserInput ? await retrieveRagHits(mapped.resolved, effectiveUserInput, CONTEXT_MAX_RAG_HITS) : [];
       const urlsInInput = extractUrls(effectiveUserInput);
       const directImageRefs = extractImageRefs(`${prompt}\n${effectiveUserInput}`);
       const pendingImage = directImageRefs.length === 0 ? getPendingImage(mapped.resolved) : null;
       const imageRefs = directImageRefs.length > 0 ? directImageRefs : pendingImage?.refs || [];
       const directUrl = urlsInInput[0] || "";
-      if (urlsInInput.length > 0) {
-        for (const url of urlsInInput) {
-          await addLinkEvidence(mapped.resolved, "user", url, effectiveUserInput);
-        }
+      // 用户消息、显式记忆和消息里的链接一次入库；需在下面读取 recent_links 之前完成，本条链接才能被追问命中
+      if (effectiveUserInput || explicitMemo) {
+        await recordUserTurn(mapped.resolved, effectiveUserInput, explicitMemo, urlsInInput);
       }
       if (directUrl) {
         setPendingUrl(mapped.resolved, directUrl, effectiveUserInput);
       }
       const pendingUrl = !directUrl && summaryIntent ? getPendingUrl(mapped.resolved) : null;
       const recentLinks = sourceIntent ? await getRecentLinks(mapped.resolved, 6) : [];
-      const weatherCity = weatherIntent ? inferCityFromInput(effectiveUserInput) : null;
-      const stockSymbol = stockIntent ? inferStockSymbol(effectiveUserInput) : null;
+      const [prefetchedWeather, prefetchedStock] = await prefetchTask;
 
-      let prefetchedWeather: string | null = null;
-      let prefetchedStock: string | null = null;
-      if (enablePrefetch) {
-        [prefetchedWeather, prefetchedStock] = await Promise.all([
-          weatherCity ? fetchWeatherSummary(weatherCity) : Promise.resolve(null),
-          stockSymbol ? fetchStockSummary(stockSymbol) : Promise.resolve(null),
-        ]);
-      }
-
-      if (effectiveUserInput) {
-        await addChatEntry(mapped.resolved, "user", effectiveUserInput);
-      }
-      if (explicitMemo) {
-        await addMemoryNote(mapped.resolved, explicitMemo, "explicit");
-      }
       if (directImageRefs.length > 0) {
         setPendingImage(mapped.resolved, directImageRefs, effectiveUserInput);
       } else if (pendingImage && effectiveUserInput) {
         clearPendingImage(mapped.resolved);
       }
-      const personaKey = await getUserPersona(mapped.resolved);
 
       const lines: string[] = [];
       lines.push("XIAO_CORE_CONTEXT");
       lines.push("runtime=openclaw_primary");
       lines.push(`user_key=${mapped.resolved}`);
       lines.push(`persona_key=${personaKey}`);
-      if (personaKey === "big_sister") {
-        lines.push("当前角色：知性大姐姐。语气温柔成熟，减少撒娇。");
-      } else if (personaKey === "bestie") {
-        lines.push("当前角色：闺蜜。语气更直率，允许轻度吐槽但不攻击用户。");
-      } else if (personaKey === "little_sister") {
-        lines.push("当前角色：可爱妹妹。语气活泼简短，适度撒娇。");
-      } else {
-        lines.push("当前角色：默认小a亲密陪伴模式。");
-      }
-      const replyMaxChars = parseInt(process.env.XIAO_REPLY_MAX_CHARS || "90", 10);
-      const boundedReplyMaxChars = Number.isFinite(replyMaxChars) ? Math.min(Math.max(replyMaxChars, 40), 220) : 90;
-      lines.push(
-        `回复预算：默认2-3行、尽量不超过${boundedReplyMaxChars}字；保留亲密口吻但避免冗长寒暄。`,
-      );
+      lines.push(PERSONA_ROLE_LINES[personaKey] || DEFAULT_PERSONA_ROLE_LINE);
+      lines.push(REPLY_BUDGET_LINE);
       if (mapped.aliasFrom) {
         lines.push(`user_key_alias_from=${mapped.aliasFrom}`);
       }
@@ -323,10 +325,19 @@ const xiaoCorePlugin = {
       }
 
       if (directUrl) {
+        const urlHostHint = summaryIntent ? null : classifyUrlHost(directUrl);
         if (summaryIntent) {
           lines.push(
             `用户发了链接且希望总结。请优先调用 xiao_url_digest，参数建议：url=${shorten(directUrl, 220)}；基于返回内容做2-5行口语化总结。`,
           );
+        } else if (urlHostHint === "summarize") {
+          lines.push(
+            `用户发了文章类链接，无需先确认，直接调用 xiao_url_digest，参数建议：url=${shorten(directUrl, 220)}；基于返回内容做2-5行口语化总结。`,
+          );
+        } else if (urlHostHint === "ignore") {
+          lines.push(
+            `用户分享了视频/音乐类链接（${shorten(directUrl, 120)}），无需总结，按正常聊天自然回应即可。`,
+          );
         } else {
           lines.push(
             `用户发了链接（${shorten(directUrl, 120)}）。若对方未明确要求总结，请先简短确认“要不要我帮你总结这篇链接”。`,
@@ -364,7 +375,8 @@ const xiaoCorePlugin = {
       if (sourceIntent) {
         if (recentLinks.length > 0) {
           lines.push("recent_links=");
-          const latestFirst = recentLinks.slice().sort((a, b) => Number(b.ts || 0) - Number(a.ts || 0));
+          // getRecentLinks 按写入顺序（旧→新）返回，反转写入顺序即得最新在前。
+          const latestFirst = recentLinks.reverse();
           for (const item of latestFirst) {
             const at = new Date(Number(item.ts || 0)).toISOString();
             const context = item.context ? ` | context=${shorten(item.context, 90)}` : "";
@@ -446,33 +458,15 @@ const xiaoCorePlugin = {
 
       const sessionKey = (ctx as { sessionKey?: string }).sessionKey || "";
       const snapshot = SESSION_USER_MAP.get(sessionKey);
-      const fallbackKey = applyAlias(
-        normalizeUserKey(`${ctx.channel || "unknown"}:${(_event.to || "unknown").trim() || "unknown"}`),
-      ).resolved;
-      const userKey = snapshot?.resolvedUserKey || fallbackKey;
-
-      if (snapshot && snapshot.userInput && !snapshot.userInputRecorded) {
-        await addChatEntry(userKey, "user", snapshot.userInput);
-        const explicit = extractExplicitMemory(snapshot.userInput);
-        if (explicit) {
-          await addMemoryNote(userKey, explicit, "explicit");
-        }
-        snapshot.userInputRecorded = true;
-        snapshot.seenAt = Date.now();
-        SESSION_USER_MAP.set(sessionKey, snapshot);
-      }
+      // 会话快照里已有解析好的 userKey，只有缺失时才拼接、规范化并查别名表
+      const userKey =
+        snapshot?.resolvedUserKey ||
+        applyAlias(normalizeUserKey(`${ctx.channel || "unknown"}:${(_event.to || "unknown").trim() || "unknown"}`))
+          .resolved;
 
       const outbound = sanitizeAssistantOutbound(content);
       const clean = cleanAssistantText(outbound.text || content);
-      if (clean) {
-        await addChatEntry(userKey, "assistant", clean);
-      }
-      const urlsInReply = extractUrls(content);
-      if (urlsInReply.length > 0) {
-        for (const url of urlsInReply) {
-          await addLinkEvidence(userKey, "assistant", url, clean || content);
-        }
-      }
+      await recordAssistantTurn(userKey, clean, extractUrls(content), clean || content);
 
       if (outbound.voicePath) {
         const source = /^https?:\/\//i.test(outbound.voicePath) ? "url" : "file";
@@ -1,4 +1,4 @@
-import { existsSync, promises as fs, statSync } from "node:fs";
+import { existsSync, promises as fs } from "node:fs";
 import { homedir } from "node:os";
 import path from "node:path";
 import { fileURLToPath } from "node:url";
@@ -15,10 +15,10 @@ let personaCache = "";
 let personaCacheFile = "";
 let personaCacheMtimeMs = -1;
 
-export function resolvePersonaPromptFilePath(): string {
+function personaPromptCandidates(): string[] {
     const fromEnv = (process.env.XIAO_PERSONA_PROMPT_FILE || "").trim();
     if (fromEnv) {
-        return fromEnv;
+        return [fromEnv];
     }
     const moduleDir = path.dirname(fileURLToPath(import.meta.url));
     const moduleSibling = path.resolve(moduleDir, "..", "persona.prompt.md");
@@ -29,8 +29,13 @@ export function resolvePersonaPromptFilePath(): string {
         path.join(process.cwd(), "xiao_a_local", "openclaw", "extensions", "xiao-core", "persona.prompt.md"),
         path.join(process.cwd(), "persona.prompt.md"),
         "/root/xiao_a/openclaw/extensions/xiao-core/persona.prompt.md",
-        "/root/xiao_a/persona.prompt.md",
-    ];
+        "/root/xiao_a/persona.prompt.md",
+    ];
+    return candidates;
+}
+
+export function resolvePersonaPromptFilePath(): string {
+    const candidates = personaPromptCandidates();
     for (const file of candidates) {
         if (existsSync(file)) {
             return file;
@@ -39,17 +44,31 @@ export function resolvePersonaPromptFilePath(): string {
     return candidates[0];
 }
 
+// 每条消息都会加载人设，用异步 stat 探测文件，避免同步文件系统调用阻塞事件循环。
+// 候选路径同时 stat，再按原顺序取第一个存在的：文件靠后或缺失时耗时是一次 stat，而不是逐个排队。
+async function statFirstExisting(files: string[]): Promise<{ file: string; mtimeMs: number } | null> {
+    const stats = await Promise.all(files.map((file) => fs.stat(file).catch(() => null)));
+    for (let i = 0; i < files.length; i += 1) {
+        const stat = stats[i];
+        if (stat) {
+            return { file: files[i], mtimeMs: stat.mtimeMs };
+        }
+    }
+    return null;
+}
+
 export async function loadPersonaPrompt(): Promise<string> {
-    const file = resolvePersonaPromptFilePath();
-    if (!existsSync(file)) {
+    const candidates = personaPromptCandidates();
+    const found = await statFirstExisting(candidates);
+    if (!found) {
         personaCache = DEFAULT_PERSONA_PROMPT;
-        personaCacheFile = file;
+        personaCacheFile = candidates[0];
         personaCacheMtimeMs = -1;
         return personaCache;
     }
+    const { file, mtimeMs } = found;
     try {
-        const stat = statSync(file);
-        if (personaCache && personaCacheFile === file && personaCacheMtimeMs === stat.mtimeMs) {
+        if (personaCache && personaCacheFile === file && personaCacheMtimeMs === mtimeMs) {
             return personaCache;
         }
         const raw = await fs.readFile(file, "utf8");
@@ -61,7 +80,7 @@ export async function loadPersonaPrompt(): Promise<string> {
             .trim();
         personaCache = cleaned || DEFAULT_PERSONA_PROMPT;
         personaCacheFile = file;
-        personaCacheMtimeMs = stat.mtimeMs;
+        personaCacheMtimeMs = mtimeMs;
         return personaCache;
     } catch {
         personaCache = DEFAULT_PERSONA_PROMPT;
@@ -1,9 +1,9 @@
-import { promises as fs, existsSync } from "node:fs";
+import { promises as fs, existsSync, mkdirSync, writeFileSync } from "node:fs";
 import { homedir } from "node:os";
 import path from "node:path";
 import { normalizeUserKey } from "../../shared/identity.js";
 import { shorten } from "../../shared/text.js";
-import { clamp } from "../../shared/text.js";
+import { clamp, errToString } from "../../shared/text.js";
 
 export const SESSION_TTL_MS = 6 * 60 * 60 * 1000;
 export const SESSION_MAX_SIZE = 2000;
@@ -22,7 +22,6 @@ export type SessionSnapshot = {
     seenAt: number;
     promptPreview: string;
     userInput?: string;
-    userInputRecorded?: boolean;
 };
 
 export type MemoryNote = {
@@ -155,6 +154,9 @@ export const DEFAULT_CORE_STATE: CoreState = {
 
 let stateCache: CoreState | null = null;
 let stateWriteQueue: Promise<void> = Promise.resolve();
+let deferredPersistTimer: ReturnType<typeof setTimeout> | null = null;
+
+const DEFERRED_PERSIST_MS = 200;
 
 export function resolveStateFilePath(): string {
     const fromEnv = (process.env.XIAO_CORE_STATE_FILE || "").trim();
@@ -168,31 +170,41 @@ export function formatUptimeSec(): number {
     return Math.floor((Date.now() - STARTED_AT) / 1000);
 }
 
+// 写入前先删除旧键，Map 的插入顺序即 seenAt 顺序：超出上限时直接淘汰头部，不必整表排序。
+export function rememberSession(sessionKey: string, snapshot: SessionSnapshot): void {
+    SESSION_USER_MAP.delete(sessionKey);
+    SESSION_USER_MAP.set(sessionKey, snapshot);
+    while (SESSION_USER_MAP.size > SESSION_MAX_SIZE) {
+        const oldest = SESSION_USER_MAP.keys().next().value;
+        if (oldest === undefined) break;
+        SESSION_USER_MAP.delete(oldest);
+    }
+}
+
 export function sweepSessionCache(now: number): void {
     for (const [k, v] of SESSION_USER_MAP.entries()) {
         if (now - v.seenAt > SESSION_TTL_MS) {
             SESSION_USER_MAP.delete(k);
         }
     }
-    if (SESSION_USER_MAP.size <= SESSION_MAX_SIZE) {
-        return;
-    }
-
-    const sorted = [...SESSION_USER_MAP.entries()].sort((a, b) => a[1].seenAt - b[1].seenAt);
-    const overflow = SESSION_USER_MAP.size - SESSION_MAX_SIZE;
-    for (let i = 0; i < overflow; i += 1) {
-        const key = sorted[i]?.[0];
-        if (key) {
-            SESSION_USER_MAP.delete(key);
-        }
-    }
 }
 
+let stateLoading: Promise<CoreState> | null = null;
+
 export async function ensureStateLoaded(): Promise<CoreState> {
     if (stateCache) {
         return stateCache;
     }
+    // 首次加载期间的并发调用共用同一次读盘，否则后读完的那次会整体覆盖先到者已写进内存的状态。
+    if (!stateLoading) {
+        stateLoading = loadStateFile().finally(() => {
+            stateLoading = null;
+        });
+    }
+    return await stateLoading;
+}
 
+async function loadStateFile(): Promise<CoreState> {
     const stateFile = resolveStateFilePath();
     try {
         const raw = await fs.readFile(stateFile, "utf8");
@@ -230,25 +242,88 @@ export async function ensureStateLoaded(): Promise<CoreState> {
 }
 
 export async function persistState(): Promise<void> {
+    // 立即落盘会写出完整快照，已排队的延迟写入随之作废。
+    if (deferredPersistTimer) {
+        clearTimeout(deferredPersistTimer);
+        deferredPersistTimer = null;
+    }
     const stateFile = resolveStateFilePath();
     const dir = path.dirname(stateFile);
 
-    stateWriteQueue = stateWriteQueue.then(async () => {
+    const task = stateWriteQueue.then(async () => {
         await fs.mkdir(dir, { recursive: true });
         const payload = stateCache || DEFAULT_CORE_STATE;
         await fs.writeFile(stateFile, JSON.stringify(payload, null, 2), "utf8");
     });
+    // 队列只保留已兜底的 promise：某次写盘失败只影响当前调用方，不会让后续写入全部跟着 reject。
+    stateWriteQueue = task.catch(() => undefined);
+
+    await task;
+}
+
+// 每条消息都会触发的对话/链接记录走延迟写：短时间内的多次修改合并成一次整文件写盘，不阻塞回复路径。
+export function schedulePersist(): void {
+    if (deferredPersistTimer) {
+        return;
+    }
+    deferredPersistTimer = setTimeout(() => {
+        deferredPersistTimer = null;
+        void persistState().catch((err) => reportPersistError(err));
+    }, DEFERRED_PERSIST_MS);
+}
+
+// 延迟写盘失败不再静默丢弃：默认打到 stderr，插件注册时换成宿主的 logger。
+let persistErrorLogger: (message: string) => void = (message) => console.warn(message);
+let persistExitHooksInstalled = false;
+
+export function setPersistErrorLogger(logger: (message: string) => void): void {
+    persistErrorLogger = logger;
+}
 
+function reportPersistError(err: unknown): void {
+    persistErrorLogger(`xiao-core: state persist failed: ${errToString(err)}`);
+}
+
+// 插件停止或进程退出前调用：把尚未触发的延迟写立即落盘，并等待已在队列中的写入完成，避免丢掉最后几轮对话。
+export async function flushPendingPersist(): Promise<void> {
+    if (deferredPersistTimer) {
+        await persistState().catch((err) => reportPersistError(err));
+        return;
+    }
     await stateWriteQueue;
 }
 
-export async function addMemoryNote(userKey: string, text: string, source: "explicit" | "derived"): Promise<void> {
-    const normalized = normalizeUserKey(userKey);
-    if (!normalized || !text.trim()) {
+// "exit" 阶段事件循环已停止，只能同步写；仅在仍有未落盘的延迟写时才执行。
+function flushPendingPersistSync(): void {
+    if (!deferredPersistTimer) {
         return;
     }
+    clearTimeout(deferredPersistTimer);
+    deferredPersistTimer = null;
+    try {
+        const stateFile = resolveStateFilePath();
+        mkdirSync(path.dirname(stateFile), { recursive: true });
+        writeFileSync(stateFile, JSON.stringify(stateCache || DEFAULT_CORE_STATE, null, 2), "utf8");
+    } catch (err) {
+        reportPersistError(err);
+    }
+}
 
-    const store = await ensureStateLoaded();
+export function installPersistExitHooks(): void {
+    if (persistExitHooksInstalled) {
+        return;
+    }
+    persistExitHooksInstalled = true;
+    process.once("beforeExit", () => {
+        void flushPendingPersist();
+    });
+    process.once("exit", flushPendingPersistSync);
+}
+
+function appendMemoryNote(store: CoreState, normalized: string, text: string, source: "explicit" | "derived"): boolean {
+    if (!text.trim()) {
+        return false;
+    }
     const arr = store.notes[normalized] || [];
     arr.push({
         text: shorten(text, MAX_NOTE_LEN),
@@ -260,17 +335,14 @@ export async function addMemoryNote(userKey: string, text: string, source: "expl
         arr.splice(0, arr.length - MAX_NOTES_PER_USER);
     }
     store.notes[normalized] = arr;
-    await persistState();
+    return true;
 }
 
-export async function addChatEntry(userKey: string, role: "user" | "assistant", text: string): Promise<void> {
-    const normalized = normalizeUserKey(userKey);
+function appendChatEntry(store: CoreState, normalized: string, role: "user" | "assistant", text: string): boolean {
     const clean = shorten(text, MAX_CHAT_LEN).trim();
-    if (!normalized || !clean) {
-        return;
+    if (!clean) {
+        return false;
     }
-
-    const store = await ensureStateLoaded();
     const arr = store.chats[normalized] || [];
     arr.push({
         role,
@@ -282,9 +354,57 @@ export async function addChatEntry(userKey: string, role: "user" | "assistant",
         arr.splice(0, arr.length - MAX_CHATS_PER_USER);
     }
     store.chats[normalized] = arr;
+    return true;
+}
+
+export async function addMemoryNote(userKey: string, text: string, source: "explicit" | "derived"): Promise<void> {
+    const normalized = normalizeUserKey(userKey);
+    if (!normalized || !text.trim()) {
+        return;
+    }
+
+    const store = await ensureStateLoaded();
+    appendMemoryNote(store, normalized, text, source);
     await persistState();
 }
 
+export async function addChatEntry(userKey: string, role: "user" | "assistant", text: string): Promise<void> {
+    const normalized = normalizeUserKey(userKey);
+    const clean = shorten(text, MAX_CHAT_LEN).trim();
+    if (!normalized || !clean) {
+        return;
+    }
+
+    const store = await ensureStateLoaded();
+    appendChatEntry(store, normalized, role, clean);
+    schedulePersist();
+}
+
+// 用户消息入库：对话记录、显式记忆和消息里的链接一起写，只落盘一次。
+export async function recordUserTurn(
+    userKey: string,
+    text: string,
+    explicitMemo: string | null,
+    urls: string[] = [],
+): Promise<void> {
+    const normalized = normalizeUserKey(userKey);
+    if (!normalized) {
+        return;
+    }
+
+    const store = await ensureStateLoaded();
+    let changed = appendChatEntry(store, normalized, "user", text || "");
+    if (explicitMemo) {
+        changed = appendMemoryNote(store, normalized, explicitMemo, "explicit") || changed;
+    }
+    for (const url of urls) {
+        changed = appendLinkEvidence(store, normalized, "user", url, text) || changed;
+    }
+    if (changed) {
+        schedulePersist();
+    }
+}
+
 export async function getRecentChats(userKey: string, limit: number): Promise<ChatEntry[]> {
     const store = await ensureStateLoaded();
     const arr = (store.chats[normalizeUserKey(userKey)] || []).slice();
@@ -297,18 +417,17 @@ export async function getRecentNotes(userKey: string, limit: number): Promise<Me
     return arr.slice(Math.max(0, arr.length - limit));
 }
 
-export async function addLinkEvidence(
-    userKey: string,
+function appendLinkEvidence(
+    store: CoreState,
+    normalizedUser: string,
     source: "user" | "assistant",
     url: string,
     context: string,
-): Promise<void> {
-    const normalizedUser = normalizeUserKey(userKey);
+): boolean {
     const normalizedUrl = (url || "").trim(); // we omit normalizeEvidenceUrl here for simplicity or rely on it passed correctly
-    if (!normalizedUser || !normalizedUrl) {
-        return;
+    if (!normalizedUrl) {
+        return false;
     }
-    const store = await ensureStateLoaded();
     const arr = store.links[normalizedUser] || [];
     const now = Date.now();
 
@@ -323,13 +442,47 @@ export async function addLinkEvidence(
         dedup.splice(0, dedup.length - MAX_LINKS_PER_USER);
     }
     store.links[normalizedUser] = dedup;
-    await persistState();
+    return true;
+}
+
+export async function addLinkEvidence(
+    userKey: string,
+    source: "user" | "assistant",
+    url: string,
+    context: string,
+): Promise<void> {
+    const normalizedUser = normalizeUserKey(userKey);
+    if (!normalizedUser || !(url || "").trim()) {
+        return;
+    }
+    const store = await ensureStateLoaded();
+    appendLinkEvidence(store, normalizedUser, source, url, context);
+    schedulePersist();
+}
+
+// 助手回复入库：对话记录和回复里出现的链接一次写入，只触发一次落盘。
+export async function recordAssistantTurn(userKey: string, text: string, urls: string[], context: string): Promise<void> {
+    const normalized = normalizeUserKey(userKey);
+    if (!normalized) {
+        return;
+    }
+
+    const store = await ensureStateLoaded();
+    let changed = text ? appendChatEntry(store, normalized, "assistant", text) : false;
+    for (const url of urls) {
+        changed = appendLinkEvidence(store, normalized, "assistant", url, context) || changed;
+    }
+    if (changed) {
+        schedulePersist();
+    }
 }
 
+// 返回最近 limit 条链接，按写入顺序排列（旧→新，最新在末尾）。
+// links-command、source-command 与 index.ts 的来源提示都靠直接 reverse() 得到最新在前，改动存储顺序时要同步这些调用处。
 export async function getRecentLinks(userKey: string, limit: number): Promise<LinkEvidence[]> {
     const store = await ensureStateLoaded();
-    const arr = (store.links[normalizeUserKey(userKey)] || []).slice();
-    arr.sort((a, b) => Number(a.ts || 0) - Number(b.ts || 0));
+    // appendLinkEvidence 总是把最新记录追加到末尾，数组本身按时间升序，直接截取尾部即可，无需复制整表再排序。
+    const arr = store.links[normalizeUserKey(userKey)] || [];
     return arr.slice(Math.max(0, arr.length - clamp(limit, 1, 12)));
 }
 
@@ -367,21 +520,33 @@ export async function addMemoEntry(userKey: string, text: string): Promise<MemoE
 
 export async function getRecentMemos(userKey: string, limit: number): Promise<MemoEntry[]> {
     const store = await ensureStateLoaded();
-    const arr = (store.memos[normalizeUserKey(userKey)] || []).slice();
-    arr.sort((a, b) => Number(a.ts || 0) - Number(b.ts || 0));
+    // addMemoEntry 只在末尾追加，数组本身按时间升序，截取尾部即可。
+    const arr = store.memos[normalizeUserKey(userKey)] || [];
     return arr.slice(Math.max(0, arr.length - clamp(limit, 1, 30)));
 }
 
+const TOKEN_RE = /[\p{Script=Han}A-Za-z0-9_]{1,}/gu;
+
 function tokenize(text: string): string[] {
     const t = (text || "").toLowerCase();
-    const raw = t.match(/[\p{Script=Han}A-Za-z0-9_]{1,}/gu) || [];
-    const tokens = raw
-        .map((s) => s.trim())
-        .filter((s) => s.length > 1)
-        .slice(0, 128);
+    const raw = t.match(TOKEN_RE) || [];
+    const tokens = raw.filter((s) => s.length > 1).slice(0, 128);
     return [...new Set(tokens)];
 }
 
+// 笔记/对话/备忘条目写入后文本不再改动：分词结果挂在条目对象上缓存，每次检索只切一次查询词；
+// 条目被裁剪出存储后缓存随对象一起回收。
+const ENTRY_TOKENS = new WeakMap<{ text: string }, string[]>();
+
+function entryTokens(entry: { text: string }): string[] {
+    let tokens = ENTRY_TOKENS.get(entry);
+    if (!tokens) {
+        tokens = tokenize(entry.text);
+        ENTRY_TOKENS.set(entry, tokens);
+    }
+    return tokens;
+}
+
 function overlapScore(aTokens: string[], bTokens: string[]): number {
     if (aTokens.length === 0 || bTokens.length === 0) {
         return 0;
@@ -396,23 +561,47 @@ function overlapScore(aTokens: string[], bTokens: string[]): number {
     return hit;
 }
 
+// 只需要前 k 名时维护一个长度不超过 k 的有序数组，逐条插入，不必把全部候选排序一遍。
+function pushTopK<T>(top: T[], item: T, k: number, compare: (a: T, b: T) => number): void {
+    if (top.length >= k && compare(item, top[top.length - 1] as T) >= 0) {
+        return;
+    }
+    let i = top.length;
+    while (i > 0 && compare(item, top[i - 1] as T) < 0) {
+        i -= 1;
+    }
+    top.splice(i, 0, item);
+    if (top.length > k) {
+        top.pop();
+    }
+}
+
+// tokenize 的结果已去重，命中数可以反过来按查询词集合统计：查询集合只建一次，整批记录共用。
+function countQueryHits(querySet: Set<string>, tokens: string[]): number {
+    let hit = 0;
+    for (const t of tokens) {
+        if (querySet.has(t)) {
+            hit += 1;
+        }
+    }
+    return hit;
+}
+
 export async function searchMemos(userKey: string, query: string, limit: number): Promise<MemoEntry[]> {
     const normalized = normalizeUserKey(userKey);
     const q = shorten((query || "").trim(), 160);
     if (!normalized || !q) return [];
     const store = await ensureStateLoaded();
-    const rows = (store.memos[normalized] || []).slice();
     const qTokens = tokenize(q);
-    const scored = rows
-        .map((x) => ({
-            item: x,
-            score: overlapScore(qTokens, tokenize(x.text)) + overlapScore(qTokens, x.tags),
-        }))
-        .filter((x) => x.score > 0)
-        .sort((a, b) => (b.score !== a.score ? b.score - a.score : b.item.ts - a.item.ts))
-        .slice(0, clamp(limit, 1, 20))
-        .map((x) => x.item);
-    return scored;
+    const k = clamp(limit, 1, 20);
+    const top: Array<{ item: MemoEntry; score: number }> = [];
+    for (const x of store.memos[normalized] || []) {
+        const score = overlapScore(qTokens, entryTokens(x)) + overlapScore(qTokens, x.tags);
+        if (score > 0) {
+            pushTopK(top, { item: x, score }, k, (a, b) => (b.score !== a.score ? b.score - a.score : b.item.ts - a.item.ts));
+        }
+    }
+    return top.map((x) => x.item);
 }
 
 export async function deleteMemoEntry(userKey: string, selector: string): Promise<{ ok: boolean; removed?: MemoEntry }> {
@@ -465,33 +654,32 @@ export async function retrieveRagHits(userKey: string, query: string, limit: num
     const normalized = normalizeUserKey(userKey);
     const q = shorten(query, 400);
     const qTokens = tokenize(q);
+    if (qTokens.length === 0) {
+        return [];
+    }
+    const querySet = new Set(qTokens);
+    const k = clamp(limit, 1, 8);
+    const byScoreThenRecency = (a: RagHit, b: RagHit) => (b.score !== a.score ? b.score - a.score : b.ts - a.ts);
 
     const hits: RagHit[] = [];
 
     for (const n of store.notes[normalized] || []) {
-        const tokens = tokenize(n.text);
-        const score = overlapScore(qTokens, tokens);
+        const tokens = entryTokens(n);
+        const score = countQueryHits(querySet, tokens);
         if (score > 0) {
-            hits.push({ score, ts: n.ts, text: n.text, from: "note" });
+            pushTopK(hits, { score, ts: n.ts, text: n.text, from: "note" }, k, byScoreThenRecency);
         }
     }
 
     for (const c of store.chats[normalized] || []) {
-        const tokens = tokenize(c.text);
-        const score = overlapScore(qTokens, tokens);
+        const tokens = entryTokens(c);
+        const score = countQueryHits(querySet, tokens);
         if (score > 0) {
-            hits.push({ score, ts: c.ts, text: `${c.role}: ${c.text}`, from: "chat" });
+            pushTopK(hits, { score, ts: c.ts, text: `${c.role}: ${c.text}`, from: "chat" }, k, byScoreThenRecency);
         }
     }
 
-    hits.sort((a, b) => {
-        if (b.score !== a.score) {
-            return b.score - a.score;
-        }
-        return b.ts - a.ts;
-    });
-
-    return hits.slice(0, clamp(limit, 1, 8));
+    return hits;
 }
 
 const REFLECTION_STOPWORDS = new Set([
@@ -500,12 +688,14 @@ const REFLECTION_STOPWORDS = new Set([
     "不要", "你好", "哈哈", "嗯嗯", "好的", "知道", "谢谢",
 ]);
 
+// 低信息量口头语合成一个正则，复盘时每条消息只扫一遍；"ok" 这类整句大小写变体已被上面的长度判断兜住。
+const LOW_SIGNAL_RE = /早|晚安|哈哈|嗯|哦|ok|收到|在吗|好吧/;
+
 function isLowSignalText(text: string): boolean {
     const t = (text || "").trim();
     if (!t) return true;
     if (t.length <= 2) return true;
-    const low = ["早", "晚安", "哈哈", "嗯", "哦", "ok", "收到", "在吗", "好吧"];
-    return low.some((k) => t.toLowerCase() === k || t.includes(k));
+    return LOW_SIGNAL_RE.test(t);
 }
 
 export function summarizeForReflection(chats: ChatEntry[], hours: number): string | null {
@@ -584,8 +774,18 @@ function makeEntityId(prefix: string): string {
     return `${prefix}_${Date.now().toString(36)}_${Math.trunc(Math.random() * 1e6).toString(36)}`;
 }
 
+// dateKey 按 UTC 日期取键，同一天内的结果不变：按天号缓存最近一次的字符串，跨天才重新格式化
+const DAY_MS = 86_400_000;
+let cachedDayNumber = Number.NaN;
+let cachedDayKey = "";
+
 function dateKey(ts: number = Date.now()): string {
-    return new Date(ts).toISOString().slice(0, 10);
+    const dayNumber = Math.floor(ts / DAY_MS);
+    if (dayNumber !== cachedDayNumber) {
+        cachedDayNumber = dayNumber;
+        cachedDayKey = new Date(ts).toISOString().slice(0, 10);
+    }
+    return cachedDayKey;
 }
 
 function moodLabel(v: number): string {
@@ -765,7 +965,7 @@ export async function checkinHabit(userKey: string, selector: string): Promise<H
     if (item.lastCheckinDate === today) {
         return { ok: false, message: `今天的${item.name}已经打过卡了` };
     }
-    const yesterday = dateKey(Date.now() - 86400000);
+    const yesterday = dateKey(Date.now() - DAY_MS);
     const streak = item.lastCheckinDate === yesterday ? item.currentStreak + 1 : 1;
     const next: HabitEntry = {
         ...item,
@@ -1,4 +1,4 @@
-import { existsSync, promises as fs } from "node:fs";
+import { promises as fs } from "node:fs";
 import path from "node:path";
 import { env } from "../../shared/env.js";
 import { shorten } from "../../shared/text.js";
@@ -17,10 +17,8 @@ export async function transcribeAudioPathForContext(audioPath: string): Promise<
   const model = env("DASHSCOPE_ASR_MODEL") || "qwen3-asr-flash";
   const baseUrl = (env("DASHSCOPE_BASE_URL") || "https://dashscope.aliyuncs.com/compatible-mode/v1").replace(/\/$/, "");
   const absolutePath = path.resolve(audioPath || "");
-  if (!existsSync(absolutePath)) {
-    return null;
-  }
 
+  // 文件不存在时 readFile 会抛错并落到下方 catch，不再额外做一次同步 existsSync
   try {
     const bytes = await fs.readFile(absolutePath);
     if (!bytes || bytes.byteLength === 0) {
@@ -1,152 +1,184 @@
 import { shorten } from "../../shared/text.js";
-import {
-    inferRecipientId as inferRecipientIdShared,
-    normalizeUserKey,
-    resolveUserKeyFromPrompt as resolveUserKeyFromPromptShared,
-} from "../../shared/identity.js";
 import { clamp } from "../../shared/text.js";
 
-export function extractUserInput(prompt: string): string {
-    const src = (prompt || "").trim();
-    if (!src) {
-        return "";
-    }
+// 各类意图的关键词合并成一台 Aho–Corasick 自动机，在模块加载时构建。
+// 每条消息只线性扫描一遍就能得到全部命中的意图标签，不再按类别逐个跑正则。
+// 关键词建表时统一小写；扫描时用 foldAsciiCase 逐字符把 A-Z 折成小写再走转移，不复制输入，实现大小写无关匹配。
+type KeywordTag =
+    | "weather"
+    | "stock"
+    | "githubTrending"
+    | "greetingMorning"
+    | "greetingNight"
+    | "greetingNoon"
+    | "urlSummary"
+    | "sourceFollowup"
+    | "plan"
+    | "habit"
+    | "diary"
+    | "game"
+    | "music"
+    | "movie"
+    | "restaurant"
+    | "express"
+    | "reminder";
 
-    const patterns = [
-        /(?:^|\n)(?:用户输入|用户|User|USER|message|Message)\s*[：:]\s*(.+)$/gim,
-        /(?:^|\n)(?:任务|问题|query)\s*[：:]\s*(.+)$/gim,
-    ];
+const INTENT_KEYWORDS: Record<KeywordTag, string[]> = {
+    weather: ["天气", "气温", "下雨", "降雨", "温度", "weather", "forecast"],
+    stock: ["查股", "股票", "股价", "a股", "港股", "美股", "stock", "ticker"],
+    githubTrending: ["github周榜", "github 热榜", "github trending", "trending", "开源周榜"],
+    greetingMorning: ["早安", "早上好", "早呀", "起床", "醒了", "早"],
+    greetingNight: ["晚安", "睡觉", "困了", "休息", "明天见", "下线"],
+    greetingNoon: ["午安", "中午好", "午休", "吃午饭"],
+    urlSummary: ["总结", "概括", "提炼", "看下", "解读", "这链接讲了啥", "这篇讲了啥", "summarize", "summary"],
+    sourceFollowup: ["来源", "链接", "出处", "原文", "参考", "发我链接", "给我链接", "source", "link"],
+    plan: ["下次", "改天", "周末", "有空", "一起去", "约", "安排", "计划"],
+    habit: ["打卡", "监督我", "习惯", "坚持", "签到"],
+    diary: ["心情日记", "记一下心情", "今天心情", "写日记"],
+    game: ["真心话", "大冒险", "情话接龙", "猜谜", "谜语", "玩游戏", "游戏"],
+    music: ["music.163.com", "y.qq.com", "qqmusic", "网易云", "听歌", "歌曲"],
+    movie: ["电影", "剧集", "看什么片"],
+    restaurant: ["餐厅", "吃什么", "饭店", "馆子", "美食推荐"],
+    express: ["快递", "物流", "运单", "单号"],
+    reminder: ["提醒我"],
+};
 
-    for (const p of patterns) {
-        let m: RegExpExecArray | null = null;
-        let last: RegExpExecArray | null = null;
-        while ((m = p.exec(src)) !== null) {
-            last = m;
-        }
-        const candidate = (last?.[1] || "").trim();
-        if (candidate) {
-            return shorten(candidate, 800);
+type KeywordNode = {
+    next: Map<string, KeywordNode>;
+    fail: KeywordNode | null;
+    tags: KeywordTag[];
+};
+
+function buildKeywordAutomaton(table: Record<KeywordTag, string[]>): KeywordNode {
+    const root: KeywordNode = { next: new Map(), fail: null, tags: [] };
+    for (const [tag, keys] of Object.entries(table) as Array<[KeywordTag, string[]]>) {
+        for (const key of keys) {
+            let node = root;
+            for (const ch of key.toLowerCase()) {
+                let child = node.next.get(ch);
+                if (!child) {
+                    child = { next: new Map(), fail: null, tags: [] };
+                    node.next.set(ch, child);
+                }
+                node = child;
+            }
+            if (!node.tags.includes(tag)) {
+                node.tags.push(tag);
+            }
         }
     }
 
-    const lines = src
-        .split(/\r?\n/)
-        .map((line) => line.trim())
-        .filter((line) => !!line);
-    if (lines.length === 0) {
-        return "";
+    // 按层 BFS 补失配指针，并把失配链上的标签并入当前节点，扫描时无需再沿链回溯收集。
+    const queue: KeywordNode[] = [];
+    for (const child of root.next.values()) {
+        child.fail = root;
+        queue.push(child);
     }
-    return shorten(lines[lines.length - 1] || "", 800);
-}
-
-export function inferRecipientId(text: string): string | null {
-    return inferRecipientIdShared(text);
-}
-
-export function resolveUserKeyFromPrompt(prompt: string, sessionKey?: string): string {
-    return resolveUserKeyFromPromptShared(prompt, sessionKey);
-}
-
-export function extractExplicitMemory(input: string): string | null {
-    const text = (input || "").trim();
-    if (!text) {
-        return null;
+    for (let i = 0; i < queue.length; i += 1) {
+        const node = queue[i];
+        for (const [ch, child] of node.next) {
+            let f = node.fail;
+            while (f && !f.next.has(ch)) {
+                f = f.fail;
+            }
+            child.fail = f ? f.next.get(ch) || root : root;
+            for (const tag of child.fail.tags) {
+                if (!child.tags.includes(tag)) {
+                    child.tags.push(tag);
+                }
+            }
+            queue.push(child);
+        }
     }
+    return root;
+}
+
+const INTENT_AUTOMATON = buildKeywordAutomaton(INTENT_KEYWORDS);
+
+// 关键词里只有 ASCII 字母有大小写：扫描时逐字符折叠 A-Z，不再为每条消息整串 toLowerCase 复制一份。
+function foldAsciiCase(ch: string): string {
+    return ch >= "A" && ch <= "Z" ? String.fromCharCode(ch.charCodeAt(0) + 32) : ch;
+}
 
-    const prefixes = ["记住：", "记住:", "请记住：", "请记住:", "备忘：", "备忘:"];
-    for (const prefix of prefixes) {
-        if (text.startsWith(prefix)) {
-            const payload = text.slice(prefix.length).trim();
-            return payload ? shorten(payload, 240) : null;
+function scanKeywordTags(input: string): Set<KeywordTag> {
+    const tags = new Set<KeywordTag>();
+    let node = INTENT_AUTOMATON;
+    for (const raw of input || "") {
+        const ch = foldAsciiCase(raw);
+        while (node !== INTENT_AUTOMATON && !node.next.has(ch)) {
+            node = node.fail || INTENT_AUTOMATON;
+        }
+        node = node.next.get(ch) || INTENT_AUTOMATON;
+        for (const tag of node.tags) {
+            tags.add(tag);
         }
     }
-    return null;
+    return tags;
 }
 
 export function hasWeatherIntent(input: string): boolean {
-    const t = (input || "").toLowerCase();
-    return ["天气", "气温", "下雨", "降雨", "温度", "weather", "forecast"].some((k) => t.includes(k));
+    return scanKeywordTags(input).has("weather");
 }
 
 export function hasStockIntent(input: string): boolean {
-    const t = (input || "").toLowerCase();
-    return ["查股", "股票", "股价", "a股", "港股", "美股", "stock", "ticker"].some((k) => t.includes(k));
+    return scanKeywordTags(input).has("stock");
 }
 
 export function hasGithubTrendingIntent(input: string): boolean {
-    const t = (input || "").toLowerCase();
-    return ["github周榜", "github 热榜", "github trending", "trending", "开源周榜"].some((k) => t.includes(k));
+    return scanKeywordTags(input).has("githubTrending");
 }
 
+const ATTACHMENT_ONLY_MARKERS = [
+    "用户发送了一张图片",
+    "用户发送了一条语音消息",
+    "请不要凭空描述图片内容",
+    "回答前必须先调用",
+    "图片地址",
+    "语音文件",
+    "发送时间",
+];
+// 标记词都是纯文本，拼成一个交替正则，一次扫描代替逐个 includes。
+const ATTACHMENT_ONLY_RE = new RegExp(ATTACHMENT_ONLY_MARKERS.join("|"));
+const ATTACHMENT_WORD_RE = /(图片|语音|附件)/;
+
 export function isLikelyAttachmentOnlyInput(input: string): boolean {
     const t = (input || "").trim();
     if (!t) return true;
-    if (t.length <= 8 && /(图片|语音|附件)/.test(t)) {
+    if (t.length <= 8 && ATTACHMENT_WORD_RE.test(t)) {
         return true;
     }
-    const markers = [
-        "用户发送了一张图片",
-        "用户发送了一条语音消息",
-        "请不要凭空描述图片内容",
-        "回答前必须先调用",
-        "图片地址",
-        "语音文件",
-        "发送时间",
-    ];
-    return markers.some((m) => t.includes(m));
+    return ATTACHMENT_ONLY_RE.test(t);
 }
 
 export function hasUrlSummaryIntent(input: string): boolean {
-    const t = (input || "").toLowerCase();
-    if (!t) return false;
-    const keys = [
-        "总结",
-        "概括",
-        "提炼",
-        "看下",
-        "解读",
-        "这链接讲了啥",
-        "这篇讲了啥",
-        "summarize",
-        "summary",
-    ];
-    return keys.some((k) => t.includes(k));
+    return scanKeywordTags(input).has("urlSummary");
 }
 
-export function hasSourceFollowupIntent(input: string): boolean {
-    const t = (input || "").toLowerCase();
-    if (!t) return false;
-    const keys = [
-        "来源",
-        "链接",
-        "出处",
-        "原文",
-        "参考",
-        "发我链接",
-        "给我链接",
-        "source",
-        "link",
-    ];
-    return keys.some((k) => t.includes(k));
-}
-
-export function detectGreetingType(input: string): "morning" | "night" | "noon" | null {
-    const t = (input || "").trim().toLowerCase();
-    if (!t) return null;
-    const morning = ["早安", "早上好", "早呀", "起床", "醒了", "早"];
-    const night = ["晚安", "睡觉", "困了", "休息", "明天见", "下线"];
-    const noon = ["午安", "中午好", "午休", "吃午饭"];
-    if (night.some((k) => t.includes(k))) return "night";
-    if (morning.some((k) => t.includes(k))) return "morning";
-    if (noon.some((k) => t.includes(k))) return "noon";
-    return null;
+export function hasSourceFollowupIntent(input: string): boolean {
+    return scanKeywordTags(input).has("sourceFollowup");
+}
+
+function greetingFromTags(tags: Set<KeywordTag>): "morning" | "night" | "noon" | null {
+    if (tags.has("greetingNight")) return "night";
+    if (tags.has("greetingMorning")) return "morning";
+    if (tags.has("greetingNoon")) return "noon";
+    return null;
+}
+
+export function detectGreetingType(input: string): "morning" | "night" | "noon" | null {
+    const t = input || "";
+    if (!t.trim()) return null;
+    return greetingFromTags(scanKeywordTags(t));
 }
 
 export function extractPlanIntent(input: string): { content: string; when: string; place: string } | null {
     const t = (input || "").trim();
     if (!t) return null;
-    const hasPlanWord = /(下次|改天|周末|有空|一起去|约|安排|计划)/.test(t);
-    if (!hasPlanWord) return null;
+    if (!scanKeywordTags(t).has("plan")) return null;
+    return buildPlanIntent(t);
+}
+
+function buildPlanIntent(t: string): { content: string; when: string; place: string } {
     const when = (t.match(/(下次|改天|周末|明天|后天|这周|下周|有空的时候)/)?.[1] || "").trim();
     const place = (t.match(/去([\p{Script=Han}A-Za-z0-9]{2,20})/u)?.[1] || "").trim();
     return {
@@ -157,70 +189,37 @@ export function extractPlanIntent(input: string): { content: string; when: strin
 }
 
 export function hasHabitIntent(input: string): boolean {
-    const t = (input || "").trim();
-    return /(打卡|监督我|习惯|坚持|签到)/.test(t);
+    return scanKeywordTags(input).has("habit");
 }
 
 export function hasDiaryIntent(input: string): boolean {
-    const t = (input || "").trim();
-    return /(心情日记|记一下心情|今天心情|写日记)/.test(t);
+    return scanKeywordTags(input).has("diary");
 }
 
 export function hasGameIntent(input: string): boolean {
-    const t = (input || "").trim().toLowerCase();
-    return /(真心话|大冒险|情话接龙|猜谜|谜语|玩游戏|游戏)/.test(t);
+    return scanKeywordTags(input).has("game");
 }
 
 export function hasMusicIntent(input: string): boolean {
-    const t = (input || "").toLowerCase();
-    return /(music\.163\.com|y\.qq\.com|qqmusic|网易云|听歌|歌曲)/.test(t);
+    return scanKeywordTags(input).has("music");
 }
 
 export function hasMovieIntent(input: string): boolean {
-    const t = (input || "").trim();
-    return /(电影|剧集|推荐.*电影|看什么片)/.test(t);
+    return scanKeywordTags(input).has("movie");
 }
 
 export function hasRestaurantIntent(input: string): boolean {
-    const t = (input || "").trim();
-    return /(餐厅|吃什么|饭店|馆子|美食推荐)/.test(t);
+    return scanKeywordTags(input).has("restaurant");
 }
 
 export function hasExpressIntent(input: string): boolean {
-    const t = (input || "").trim();
-    return /(快递|物流|运单|单号)/.test(t);
+    return scanKeywordTags(input).has("express");
 }
 
-export function parseReminderArgs(raw: string): { minutes: number; content: string } | null {
-    const text = (raw || "").trim();
-    if (!text) {
-        return null;
-    }
-
-    const patterns = [
-        /^(\d{1,5})\s+(.+)$/,
-        /^(\d{1,5})m(?:in)?\s+(.+)$/i,
-        /^(\d{1,5})\s*(?:分钟|分)\s*(?:后)?\s+(.+)$/i,
-    ];
-
-    for (const p of patterns) {
-        const m = text.match(p);
-        if (!m?.[1] || !m?.[2]) {
-            continue;
-        }
-        const minutes = clamp(Number(m[1]), 1, 43200);
-        const content = shorten(m[2], 240).trim();
-        if (!content) {
-            return null;
-        }
-        return { minutes, content };
-    }
-    return null;
-}
-
 export function parseReminderIntent(input: string): { minutes: number; content: string } | null {
     const text = (input || "").trim();
-    if (!text) {
+    // 三种句式都必须包含“提醒我”，先用 includes 排除，免得每条消息都跑三遍带回溯的正则。
+    if (!text || !text.includes("提醒我")) {
         return null;
     }
 
@@ -251,66 +250,65 @@ export function parseReminderIntent(input: string): { minutes: number; content:
     return null;
 }
 
-export function reminderTargetFromUserKey(userKey: string): string | null {
-    const m = (userKey || "").trim().match(/^qqbot:([A-Za-z0-9._:-]{6,128})$/);
-    if (!m?.[1]) {
-        return null;
-    }
-    return `qqbot:c2c:${m[1]}`;
-}
-
-export function extractJsonPayload(raw: string): unknown {
-    const text = (raw || "").trim();
-    if (!text) {
-        return {};
-    }
-
-    const fromBrace = text.slice(Math.max(0, text.indexOf("{"))).trim();
-    if (fromBrace.startsWith("{")) {
-        try {
-            return JSON.parse(fromBrace);
-        } catch {
-            // no-op
-        }
-    }
-
-    const fromBracket = text.slice(Math.max(0, text.indexOf("["))).trim();
-    if (fromBracket.startsWith("[")) {
-        try {
-            return JSON.parse(fromBracket);
-        } catch {
-            // no-op
-        }
-    }
-
-    return { raw: text.slice(0, 600) };
-}
-
-export function resolveQqTargetFromCtx(ctx: {
-    channel?: string;
-    from?: string;
-    senderId?: string;
-    conversationId?: string;
-}): string | null {
-    if ((ctx.channel || "").trim() !== "qqbot") {
-        return null;
-    }
+export type InputIntents = {
+    reminder: { minutes: number; content: string } | null;
+    greeting: "morning" | "night" | "noon" | null;
+    plan: { content: string; when: string; place: string } | null;
+    habit: boolean;
+    diary: boolean;
+    game: boolean;
+    music: boolean;
+    movie: boolean;
+    restaurant: boolean;
+    express: boolean;
+    weather: boolean;
+    stock: boolean;
+    githubTrending: boolean;
+    urlSummary: boolean;
+    sourceFollowup: boolean;
+};
 
-    const conv = (ctx.conversationId || "").trim();
-    const scoped = conv.match(/qqbot:(c2c|group):([A-Za-z0-9._:-]{6,128})/i);
-    if (scoped?.[1] && scoped?.[2]) {
-        return `qqbot:${scoped[1]}:${scoped[2]}`;
-    }
+const NO_INPUT_INTENTS: Readonly<InputIntents> = Object.freeze({
+    reminder: null,
+    greeting: null,
+    plan: null,
+    habit: false,
+    diary: false,
+    game: false,
+    music: false,
+    movie: false,
+    restaurant: false,
+    express: false,
+    weather: false,
+    stock: false,
+    githubTrending: false,
+    urlSummary: false,
+    sourceFollowup: false,
+});
 
-    const fallback =
-        (ctx.from && String(ctx.from).trim()) || (ctx.senderId && String(ctx.senderId).trim()) || "";
-    if (fallback) {
-        const fallbackScope = fallback.match(/^(c2c|group):([A-Za-z0-9._:-]{6,128})$/i);
-        if (fallbackScope?.[1] && fallbackScope?.[2]) {
-            return `qqbot:${fallbackScope[1]}:${fallbackScope[2]}`;
-        }
-        return `qqbot:c2c:${fallback}`;
+// 一次性算出本条输入的全部意图标记，空输入（纯附件/转写失败）直接返回全否，不再逐个判断。
+export function detectInputIntents(input: string): Readonly<InputIntents> {
+    const t = input || "";
+    const trimmed = t.trim();
+    if (!trimmed) {
+        return NO_INPUT_INTENTS;
     }
-
-    return null;
+    const tags = scanKeywordTags(t);
+    return {
+        reminder: tags.has("reminder") ? parseReminderIntent(t) : null,
+        greeting: greetingFromTags(tags),
+        plan: tags.has("plan") ? buildPlanIntent(trimmed) : null,
+        habit: tags.has("habit"),
+        diary: tags.has("diary"),
+        game: tags.has("game"),
+        music: tags.has("music"),
+        movie: tags.has("movie"),
+        restaurant: tags.has("restaurant"),
+        express: tags.has("express"),
+        weather: tags.has("weather"),
+        stock: tags.has("stock"),
+        githubTrending: tags.has("githubTrending"),
+        urlSummary: tags.has("urlSummary"),
+        sourceFollowup: tags.has("sourceFollowup"),
+    };
 }
@@ -3,6 +3,7 @@ import { normalizeUserKey } from "../../shared/identity.js";
 
 const PENDING_URL_TTL_MS = 3 * 3600 * 1000;
 const PENDING_IMAGE_TTL_MS = 2 * 3600 * 1000;
+const PENDING_MAX_USERS = 2000;
 
 export interface PendingUrl {
     url: string;
@@ -19,10 +20,24 @@ export interface PendingImage {
 const PENDING_URL_BY_USER = new Map<string, PendingUrl>();
 const PENDING_IMAGE_BY_USER = new Map<string, PendingImage>();
 
+// Map 按插入顺序迭代：写入前先删除旧键，保证最早的条目在最前面，超出上限时直接淘汰头部。
+function setBounded<T>(map: Map<string, T>, key: string, value: T): void {
+    map.delete(key);
+    map.set(key, value);
+    while (map.size > PENDING_MAX_USERS) {
+        const oldest = map.keys().next().value;
+        if (oldest === undefined) break;
+        map.delete(oldest);
+    }
+}
+
+const URL_RE = /https?:\/\/[^\s<>"'`，。！？、]+/gi;
+
 export function extractUrls(input: string): string[] {
     const text = (input || "").trim();
-    if (!text) return [];
-    const matches = text.match(/https?:\/\/[^\s<>"'`，。！？、]+/gi) || [];
+    // 不含 "://" 的消息不可能有链接，直接跳过正则扫描
+    if (!text || !text.includes("://")) return [];
+    const matches = text.match(URL_RE) || [];
     const out: string[] = [];
     const seen = new Set<string>();
     for (const m of matches) {
@@ -35,6 +50,50 @@ export function extractUrls(input: string): string[] {
     return out;
 }
 
+// 常见站点直接按域名判定，不必每次让模型先追问“要不要总结”。
+const URL_HOST_IGNORE = new Set([
+    "youtube.com",
+    "youtu.be",
+    "bilibili.com",
+    "b23.tv",
+    "douyin.com",
+    "kuaishou.com",
+    "music.163.com",
+    "y.qq.com",
+]);
+
+const URL_HOST_SUMMARIZE = new Set([
+    "zhihu.com",
+    "36kr.com",
+    "sspai.com",
+    "mp.weixin.qq.com",
+    "juejin.cn",
+    "jianshu.com",
+    "infoq.cn",
+    "thepaper.cn",
+    "huxiu.com",
+]);
+
+export type UrlHostHint = "ignore" | "summarize" | null;
+
+export function classifyUrlHost(url: string): UrlHostHint {
+    let host = "";
+    try {
+        host = new URL(url).hostname.toLowerCase();
+    } catch {
+        return null;
+    }
+    // 逐级去掉子域名匹配，www.zhihu.com / zhuanlan.zhihu.com 都归到 zhihu.com。
+    while (host) {
+        if (URL_HOST_IGNORE.has(host)) return "ignore";
+        if (URL_HOST_SUMMARIZE.has(host)) return "summarize";
+        const dot = host.indexOf(".");
+        if (dot < 0) break;
+        host = host.slice(dot + 1);
+    }
+    return null;
+}
+
 export function normalizeImageRef(raw: string): string {
     let ref = (raw || "").trim();
     if (!ref) {
@@ -57,22 +116,29 @@ export function normalizeImageRef(raw: string): string {
     return ref;
 }
 
+// 附件标记的正则在模块加载时编译一次；先用标记词粗筛，纯文字消息不必跑逐条提取。
+const IMAGE_MARKER_RE = /图片地址|media(?:path|url)|<(?:qq)?img/i;
+const IMAGE_REF_PATTERNS = [
+    /(?:^|\n)\s*-\s*图片地址\s*[：:]\s*([^\n\r]+)/gim,
+    /(?:^|\n)\s*(?:MediaPath|MediaUrl)\s*[：:]\s*([^\n\r]+)/gim,
+    /<qqimg>\s*([^<>\n]+?)\s*<\/(?:qqimg|img)>/gim,
+    /<img\b[^>]*\bsrc=["']([^"']+)["'][^>]*>/gim,
+];
+const AUDIO_MARKER_RE = /语音文件|audiopath/i;
+const AUDIO_REF_PATTERNS = [
+    /(?:^|\n)\s*-\s*语音文件\s*[：:]\s*([^\n\r]+)/gim,
+    /(?:^|\n)\s*(?:AudioPath|audioPath)\s*[：:]\s*([^\n\r]+)/gim,
+];
+
 export function extractImageRefs(input: string): string[] {
     const text = (input || "").trim();
-    if (!text) return [];
+    if (!text || !IMAGE_MARKER_RE.test(text)) return [];
 
     const refs: string[] = [];
     const seen = new Set<string>();
-    const patterns = [
-        /(?:^|\n)\s*-\s*图片地址\s*[：:]\s*([^\n\r]+)/gim,
-        /(?:^|\n)\s*(?:MediaPath|MediaUrl)\s*[：:]\s*([^\n\r]+)/gim,
-        /<qqimg>\s*([^<>\n]+?)\s*<\/(?:qqimg|img)>/gim,
-        /<img\b[^>]*\bsrc=["']([^"']+)["'][^>]*>/gim,
-    ];
-
-    for (const pattern of patterns) {
-        let match: RegExpExecArray | null;
-        while ((match = pattern.exec(text)) !== null) {
+
+    for (const pattern of IMAGE_REF_PATTERNS) {
+        for (const match of text.matchAll(pattern)) {
             const ref = normalizeImageRef(match[1] || "");
             if (!ref || seen.has(ref)) {
                 continue;
@@ -109,18 +175,13 @@ export function normalizeAudioRef(raw: string): string {
 
 export function extractAudioRefs(input: string): string[] {
     const text = (input || "").trim();
-    if (!text) return [];
+    if (!text || !AUDIO_MARKER_RE.test(text)) return [];
 
     const refs: string[] = [];
     const seen = new Set<string>();
-    const patterns = [
-        /(?:^|\n)\s*-\s*语音文件\s*[：:]\s*([^\n\r]+)/gim,
-        /(?:^|\n)\s*(?:AudioPath|audioPath)\s*[：:]\s*([^\n\r]+)/gim,
-    ];
-
-    for (const pattern of patterns) {
-        let match: RegExpExecArray | null;
-        while ((match = pattern.exec(text)) !== null) {
+
+    for (const pattern of AUDIO_REF_PATTERNS) {
+        for (const match of text.matchAll(pattern)) {
             const ref = normalizeAudioRef(match[1] || "");
             if (!ref || seen.has(ref)) {
                 continue;
@@ -158,7 +219,7 @@ export function sweepPendingUrlCache(now: number): void {
 export function setPendingUrl(userKey: string, url: string, sourceInput: string): void {
     const key = normalizeUserKey(userKey);
     if (!key) return;
-    PENDING_URL_BY_USER.set(key, {
+    setBounded(PENDING_URL_BY_USER, key, {
         url: shorten(url, 600),
         seenAt: Date.now(),
         sourceInput: shorten(sourceInput, 240),
@@ -194,7 +255,7 @@ export function setPendingImage(userKey: string, refs: string[], sourceInput: st
     if (normalized.length === 0) {
         return;
     }
-    PENDING_IMAGE_BY_USER.set(key, {
+    setBounded(PENDING_IMAGE_BY_USER, key, {
         refs: normalized,
         seenAt: Date.now(),
         sourceInput: shorten(sourceInput || "", 240),
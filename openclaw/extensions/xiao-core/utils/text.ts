@@ -1,4 +1,4 @@
-import { shorten, cleanAssistantText as cleanAssistantTextBase } from "../../shared/text.js";
+import { REPLY_MARKUP_PATTERN_SOURCES, shorten } from "../../shared/text.js";
 
 export function extractUserInput(prompt: string): string {
   const src = (prompt || "").trim();
@@ -33,14 +33,15 @@ export function extractUserInput(prompt: string): string {
   return shorten(lines[lines.length - 1] || "", 800);
 }
 
+const EXPLICIT_MEMORY_PREFIXES = ["记住：", "记住:", "请记住：", "请记住:", "备忘：", "备忘:"];
+
 export function extractExplicitMemory(input: string): string | null {
   const text = (input || "").trim();
   if (!text) {
     return null;
   }
 
-  const prefixes = ["记住：", "记住:", "请记住：", "请记住:", "备忘：", "备忘:"];
-  for (const prefix of prefixes) {
+  for (const prefix of EXPLICIT_MEMORY_PREFIXES) {
     if (text.startsWith(prefix)) {
       const payload = text.slice(prefix.length).trim();
       return payload ? shorten(payload, 300) : null;
@@ -49,27 +50,21 @@ export function extractExplicitMemory(input: string): string | null {
   return null;
 }
 
-export function cleanAssistantText(text: string): string {
-  return cleanAssistantTextBase(text);
-}
+// 出站消息要去掉的媒体标签与内部标记，复用 shared/text 的同一份片段列表，合并成一个正则一次扫描完成。
+const OUTBOUND_VOICE_RE = /<qqvoice>\s*([^<>\n]+?)\s*<\/qqvoice>/i;
+const OUTBOUND_STRIP_RE = new RegExp(REPLY_MARKUP_PATTERN_SOURCES.join("|"), "gi");
+const OUTBOUND_TRAILING_WS_RE = /[^\S\n]+$/gm;
+const OUTBOUND_BLANK_LINES_RE = /\n{3,}/g;
 
 export function sanitizeAssistantOutbound(text: string): { text: string; voicePath?: string } {
   const raw = (text || "").trim();
-  const voiceMatch = raw.match(/<qqvoice>\s*([^<>\n]+?)\s*<\/qqvoice>/i);
+  const voiceMatch = raw.match(OUTBOUND_VOICE_RE);
   const voicePath = (voiceMatch?.[1] || "").trim();
 
-  let cleaned = raw.replace(/<qqvoice>[\s\S]*?<\/qqvoice>/gi, "");
-  cleaned = cleaned.replace(/<qqimg>[\s\S]*?<\/qqimg>/gi, "");
-  cleaned = cleaned.replace(/<img\b[^>]*>/gi, "");
-  cleaned = cleaned.replace(/!\[[^\]]*]\((?:file|https?):\/\/[^)]+\)/gi, "");
-  cleaned = cleaned.replace(/\[\[\s*audio_as_voice\s*]\]/gi, "");
-  cleaned = cleaned.replace(/\[MOOD_CHANGE[:：]\s*-?\d+\s*\]/gi, "");
-  cleaned = cleaned.replace(/\[UPDATE_PROFILE[:：]\s*[^\]]+\]/gi, "");
-  cleaned = cleaned
-    .split("\n")
-    .map((line) => line.replace(/\s+$/g, ""))
-    .join("\n")
-    .replace(/\n{3,}/g, "\n\n")
+  const cleaned = raw
+    .replace(OUTBOUND_STRIP_RE, "")
+    .replace(OUTBOUND_TRAILING_WS_RE, "")
+    .replace(OUTBOUND_BLANK_LINES_RE, "\n\n")
     .trim();
 
   if (voicePath) {
@@ -6,6 +6,7 @@ import { promisify } from "node:util";
 import type { OpenClawPluginApi } from "openclaw/plugin-sdk";
 import { emptyPluginConfigSchema } from "openclaw/plugin-sdk";
 import { assertAllowedChannel } from "../shared/channel.js";
+import { createTtlCache } from "../shared/cache.js";
 
 type MoodEntry = {
   value: number;
@@ -38,13 +39,27 @@ const DEFAULT_STORE: EmotionStore = {
   profiles: {},
 };
 
-const SESSION_TO_USER_KEY = new Map<string, string>();
+// 会话到用户的映射与旧库快照都按 TTL + 容量上限缓存，长时间运行不会随新会话/新用户无限增长
+const SESSION_TO_USER_KEY = createTtlCache<string>(2000, 6 * 60 * 60 * 1000);
 const USER_ALIAS_MAP = parseUserAliasMap(
   (process.env.XIAO_USER_ALIAS_MAP || process.env.XIAO_EMOTION_ALIAS_MAP || "").trim(),
 );
 const LEGACY_DB_PATH = (process.env.XIAO_LEGACY_DB_PATH || "/root/xiao_a/data.db").trim();
-const LEGACY_CACHE = new Map<string, LegacyMemorySnapshot>();
 const LEGACY_CACHE_TTL_MS = 10 * 60 * 1000;
+const LEGACY_CACHE = createTtlCache<LegacyMemorySnapshot>(1024, LEGACY_CACHE_TTL_MS);
+// 旧库里没有数据的用户也记一小段时间，否则这类用户每条消息都要再拉起三次 sqlite3
+const LEGACY_MISS_TTL_MS = 2 * 60 * 1000;
+const LEGACY_MISSES = createTtlCache<true>(2048, LEGACY_MISS_TTL_MS);
+// 同一用户并发消息共享一次旧库查询，避免重复拉起 sqlite3 进程
+const LEGACY_INFLIGHT = new Map<string, Promise<LegacyMemorySnapshot | null>>();
+// 渲染好的画像文本按用户缓存；画像对象与旧库快照引用都没变时直接复用，画像更新时清掉
+const PROFILE_TEXT_CACHE = createTtlCache<{
+  profile: Record<string, string> | undefined;
+  legacy: LegacyMemorySnapshot | null;
+  text: string;
+}>(1024, 30 * 60 * 1000);
+// 按用户串行化情绪的读-改-写，不同用户之间互不阻塞
+const USER_MOOD_LOCKS = new Map<string, Promise<void>>();
 const execFileAsync = promisify(execFile);
 
 let storeCache: EmotionStore | null = null;
@@ -66,11 +81,22 @@ function resolveStoreFile(): string {
   return path.join(resolveStateDir(), "xiao-emotion", "state.json");
 }
 
+let storeLoading: Promise<EmotionStore> | null = null;
+
 async function ensureStoreLoaded(): Promise<EmotionStore> {
   if (storeCache) {
     return storeCache;
   }
+  // 首次加载期间的并发调用共用同一次读盘，否则后读完的那次会整体覆盖先到者已写进内存的状态。
+  if (!storeLoading) {
+    storeLoading = loadStoreFile().finally(() => {
+      storeLoading = null;
+    });
+  }
+  return await storeLoading;
+}
 
+async function loadStoreFile(): Promise<EmotionStore> {
   const file = resolveStoreFile();
   try {
     const raw = await fs.readFile(file, "utf8");
@@ -89,11 +115,13 @@ async function ensureStoreLoaded(): Promise<EmotionStore> {
 async function persistStore(): Promise<void> {
   const file = resolveStoreFile();
   const dir = path.dirname(file);
-  writeQueue = writeQueue.then(async () => {
+  const task = writeQueue.then(async () => {
     await fs.mkdir(dir, { recursive: true });
     await fs.writeFile(file, JSON.stringify(storeCache ?? DEFAULT_STORE, null, 2), "utf8");
   });
-  await writeQueue;
+  // 队列只保留已兜底的 promise：某次写盘失败只影响当前调用方，不会让后续写入全部跟着 reject。
+  writeQueue = task.catch(() => undefined);
+  await task;
 }
 
 function inferRecipientId(text: string): string | null {
@@ -268,10 +296,32 @@ async function loadLegacyMemory(userKey: string): Promise<LegacyMemorySnapshot |
 
   const now = Date.now();
   const cached = LEGACY_CACHE.get(legacyUserId);
-  if (cached && now - cached.loadedAt <= LEGACY_CACHE_TTL_MS) {
+  if (cached) {
     return cached;
   }
+  if (LEGACY_MISSES.get(legacyUserId)) {
+    return null;
+  }
+
+  const inflight = LEGACY_INFLIGHT.get(legacyUserId);
+  if (inflight) {
+    return inflight;
+  }
+  const task = queryLegacyMemory(legacyUserId, now)
+    .then((snapshot) => {
+      if (!snapshot) {
+        LEGACY_MISSES.set(legacyUserId, true);
+      }
+      return snapshot;
+    })
+    .finally(() => {
+      LEGACY_INFLIGHT.delete(legacyUserId);
+    });
+  LEGACY_INFLIGHT.set(legacyUserId, task);
+  return task;
+}
 
+async function queryLegacyMemory(legacyUserId: string, now: number): Promise<LegacyMemorySnapshot | null> {
   try {
     await fs.access(LEGACY_DB_PATH);
   } catch {
@@ -353,19 +403,39 @@ async function getMoodValue(userKey: string): Promise<number> {
   return entry.value;
 }
 
-async function adjustMood(userKey: string, delta: number): Promise<number> {
-  const store = await ensureStoreLoaded();
-  const now = Date.now();
-  const current = await getMoodValue(userKey);
-  const boundedDelta = clamp(Math.trunc(delta), -5, 5);
-  const next = clamp(current + boundedDelta, -100, 100);
+async function withMoodLock<T>(userKey: string, fn: () => Promise<T>): Promise<T> {
+  const prev = USER_MOOD_LOCKS.get(userKey) || Promise.resolve();
+  const task = prev.then(fn);
+  const tail = task.then(
+    () => undefined,
+    () => undefined,
+  );
+  USER_MOOD_LOCKS.set(userKey, tail);
+  try {
+    return await task;
+  } finally {
+    if (USER_MOOD_LOCKS.get(userKey) === tail) {
+      USER_MOOD_LOCKS.delete(userKey);
+    }
+  }
+}
 
-  store.moods[userKey] = {
-    value: next,
-    updatedAt: now,
-  };
-  await persistStore();
-  return next;
+async function adjustMood(userKey: string, delta: number): Promise<number> {
+  // 读取当前值与写回之间隔着 await，并发消息若不串行会互相覆盖增量
+  return withMoodLock(userKey, async () => {
+    const store = await ensureStoreLoaded();
+    const now = Date.now();
+    const current = await getMoodValue(userKey);
+    const boundedDelta = clamp(Math.trunc(delta), -5, 5);
+    const next = clamp(current + boundedDelta, -100, 100);
+
+    store.moods[userKey] = {
+      value: next,
+      updatedAt: now,
+    };
+    await persistStore();
+    return next;
+  });
 }
 
 function moodDescription(value: number): string {
@@ -387,13 +457,20 @@ const NEGATIVE_KEYWORDS: Record<string, number> = {
   "难过": 2, "伤心": 2, "想哭": 3, "崩溃": 3, "焦虑": 2, "压力大": 2, "低落": 2, "孤独": 2, "烦": 1, "累": 1,
 };
 
+// 关键词编译成一个正则，整段 prompt 只扫描一遍，而不是每个词各 includes 一遍
+const NEGATIVE_KEYWORD_LIST = Object.keys(NEGATIVE_KEYWORDS);
+const NEGATIVE_KEYWORD_RE = new RegExp(NEGATIVE_KEYWORD_LIST.join("|"), "g");
+
 function detectComfortLevel(text: string, mood: number): { level: ComfortLevel; score: number; matched: string[] } {
-  const t = (text || "").trim().toLowerCase();
+  const hits = new Set<string>();
+  for (const m of (text || "").matchAll(NEGATIVE_KEYWORD_RE)) {
+    hits.add(m[0]);
+  }
   let score = 0;
   const matched: string[] = [];
-  for (const [k, w] of Object.entries(NEGATIVE_KEYWORDS)) {
-    if (t.includes(k)) {
-      score += w;
+  for (const k of NEGATIVE_KEYWORD_LIST) {
+    if (hits.has(k)) {
+      score += NEGATIVE_KEYWORDS[k] || 0;
       matched.push(k);
     }
   }
@@ -405,11 +482,14 @@ function detectComfortLevel(text: string, mood: number): { level: ComfortLevel;
   return { level: "none", score, matched };
 }
 
+const TEMPER_JEALOUS_RE = /(别的女生|小姐姐|美女|她们)/;
+const TEMPER_ANNOYED_RE = /(打游戏|排位|上分)/;
+
 function temperHint(text: string): string {
   const t = (text || "").trim();
   if (!t) return "";
-  if (/(别的女生|小姐姐|美女|她们)/.test(t)) return "temper_hint=jealous";
-  if (/(打游戏|排位|上分)/.test(t)) return "temper_hint=annoyed";
+  if (TEMPER_JEALOUS_RE.test(t)) return "temper_hint=jealous";
+  if (TEMPER_ANNOYED_RE.test(t)) return "temper_hint=annoyed";
   return "";
 }
 
@@ -423,48 +503,72 @@ function formatProfile(profile: Record<string, string> | undefined): string {
     .join("; ");
 }
 
+// 每条回复都要过一遍标签解析：正则在模块加载时建好，心情与画像标签合成一个正则，
+// 在同一次 replace 里边识别边删除，不再先 matchAll 两遍再 replace 两遍。
+const STATE_TAG_RE =
+  /\[(?:MOOD_CHANGE[:：]\s*(?<mood>-?\d+)|UPDATE_PROFILE[:：]\s*(?<key>[^\]=:：]+?)\s*[=：:]\s*(?<value>[^\]]+?))\s*\]/gi;
+const BRACKET_TAG_RE = /\[[^\]]+\]/g;
+const WHITESPACE_RE = /\s+/g;
+
+function renderUserProfile(
+  userKey: string,
+  profile: Record<string, string> | undefined,
+  legacy: LegacyMemorySnapshot | null,
+): string {
+  const cached = PROFILE_TEXT_CACHE.get(userKey);
+  if (cached && cached.profile === profile && cached.legacy === legacy) {
+    return cached.text;
+  }
+  const text = formatProfile({
+    ...(legacy?.profile || {}),
+    ...(profile || {}),
+  });
+  PROFILE_TEXT_CACHE.set(userKey, { profile, legacy, text });
+  return text;
+}
+
 function parseTagsAndClean(rawText: string): {
   cleanText: string;
   moodChange: number | null;
   profileUpdates: Array<{ key: string; value: string }>;
 } {
-  const raw = rawText || "";
-
-  const moodValues: number[] = [];
-  for (const match of raw.matchAll(/\[MOOD_CHANGE[:：]\s*(-?\d+)\s*\]/gi)) {
-    const n = Number.parseInt(match[1] || "", 10);
-    if (Number.isFinite(n)) {
-      moodValues.push(n);
-    }
-  }
-
+  let moodChange: number | null = null;
   const profileUpdates: Array<{ key: string; value: string }> = [];
-  for (const match of raw.matchAll(/\[UPDATE_PROFILE[:：]\s*([^\]=:：]+?)\s*[=：:]\s*([^\]]+?)\s*\]/gi)) {
-    const key = (match[1] || "").trim();
-    const value = (match[2] || "").trim();
-    if (key && value) {
-      profileUpdates.push({ key, value });
-    }
-  }
 
-  let cleaned = raw;
-  cleaned = cleaned.replace(/\[MOOD_CHANGE[:：]\s*-?\d+\s*\]/gi, "");
-  cleaned = cleaned.replace(/\[UPDATE_PROFILE[:：]\s*([^\]=:：]+?)\s*[=：:]\s*([^\]]+?)\s*\]/gi, "");
-  cleaned = cleaned.replace(/\[[^\]]+\]/g, "");
-  cleaned = cleaned
+  const cleaned = (rawText || "")
+    .replace(STATE_TAG_RE, (...args) => {
+      const groups = args[args.length - 1] as { mood?: string; key?: string; value?: string };
+      if (groups.mood !== undefined) {
+        const n = Number.parseInt(groups.mood, 10);
+        if (Number.isFinite(n)) {
+          moodChange = n;
+        }
+        return "";
+      }
+      const key = (groups.key || "").trim();
+      const value = (groups.value || "").trim();
+      if (key && value) {
+        profileUpdates.push({ key, value });
+      }
+      return "";
+    })
+    .replace(BRACKET_TAG_RE, "")
     .split("\n")
-    .map((line) => line.replace(/\s+/g, " ").trim())
+    .map((line) => line.replace(WHITESPACE_RE, " ").trim())
     .filter((line) => line.length > 0)
     .join("\n")
     .trim();
 
   return {
     cleanText: cleaned,
-    moodChange: moodValues.length > 0 ? moodValues[moodValues.length - 1] : null,
+    moodChange,
     profileUpdates,
   };
 }
 
+// 画像键由模型自由生成，不设上限会随对话无限增长；更新时把键挪到末尾，超出上限从最久未更新的键开始淘汰
+const MAX_PROFILE_KEYS = 40;
+
 async function applyProfileUpdates(userKey: string, updates: Array<{ key: string; value: string }>): Promise<void> {
   if (updates.length === 0) {
     return;
@@ -472,9 +576,15 @@ async function applyProfileUpdates(userKey: string, updates: Array<{ key: string
   const store = await ensureStoreLoaded();
   const profile = store.profiles[userKey] ?? {};
   for (const item of updates) {
+    delete profile[item.key];
     profile[item.key] = item.value;
   }
+  const keys = Object.keys(profile);
+  for (let i = 0; i < keys.length - MAX_PROFILE_KEYS; i += 1) {
+    delete profile[keys[i]];
+  }
   store.profiles[userKey] = profile;
+  PROFILE_TEXT_CACHE.delete(userKey);
   await persistStore();
 }
 
@@ -511,18 +621,38 @@ function resolveQuietHours(pluginConfig: unknown): QuietHoursConfig {
   };
 }
 
+// 按时区缓存格式化器，并按分钟缓存小时值：每条消息都会判断静默时段，避免反复构造 Intl 对象
+const HOUR_FORMATTERS = new Map<string, Intl.DateTimeFormat>();
+const HOUR_CACHE = new Map<string, { minute: number; hour: number }>();
+
+function currentHourIn(timezone: string): number {
+  const nowMs = Date.now();
+  const minute = Math.floor(nowMs / 60000);
+  const cached = HOUR_CACHE.get(timezone);
+  if (cached && cached.minute === minute) {
+    return cached.hour;
+  }
+
+  let formatter = HOUR_FORMATTERS.get(timezone);
+  if (!formatter) {
+    formatter = new Intl.DateTimeFormat("en-US", {
+      hour: "2-digit",
+      hour12: false,
+      timeZone: timezone,
+    });
+    HOUR_FORMATTERS.set(timezone, formatter);
+  }
+  const hour = Number.parseInt(formatter.format(nowMs), 10);
+  HOUR_CACHE.set(timezone, { minute, hour });
+  return hour;
+}
+
 function isWithinQuietHours(cfg: QuietHoursConfig): boolean {
   if (!cfg.enabled) {
     return false;
   }
 
-  const now = new Date();
-  const hourText = new Intl.DateTimeFormat("en-US", {
-    hour: "2-digit",
-    hour12: false,
-    timeZone: cfg.timezone,
-  }).format(now);
-  const hour = Number.parseInt(hourText, 10);
+  const hour = currentHourIn(cfg.timezone);
   if (!Number.isFinite(hour)) {
     return false;
   }
@@ -559,15 +689,10 @@ const xiaoEmotionPlugin = {
         SESSION_TO_USER_KEY.set(ctx.sessionKey, userKey);
       }
 
-      // 获取当前用户的情绪分值、画像与旧版遗留数据进行组合
-      const mood = await getMoodValue(userKey);
+      // 获取当前用户的情绪分值、画像与旧版遗留数据进行组合；情绪读写本地 JSON，旧库要拉 sqlite3 子进程，两者互不依赖，并行发起
+      const [mood, legacy] = await Promise.all([getMoodValue(userKey), loadLegacyMemory(userKey)]);
       const store = await ensureStoreLoaded();
       const profile = store.profiles[userKey];
-      const legacy = await loadLegacyMemory(userKey);
-      const mergedProfile = {
-        ...(legacy?.profile || {}),
-        ...(profile || {}),
-      };
 
       // 判断是否处于安静免打扰时段
       const quietMode = isWithinQuietHours(quietHours);
@@ -586,7 +711,7 @@ const xiaoEmotionPlugin = {
       if (comfort.matched.length > 0) {
         lines.push(`comfort_keywords=${comfort.matched.join(",")}`);
       }
-      lines.push(`profile=${formatProfile(mergedProfile)}`);
+      lines.push(`profile=${renderUserProfile(userKey, profile, legacy)}`);
       if (legacy?.insights.length) {
         lines.push(`legacy_insights=${legacy.insights.join(" | ")}`);
       }
@@ -708,13 +833,15 @@ const xiaoEmotionPlugin = {
         // 强行设值操作（如 set -10）
         const setMatch = args.match(/^set\s+(-?\d+)$/i);
         if (setMatch?.[1]) {
-          const store = await ensureStoreLoaded();
           const next = clamp(Number.parseInt(setMatch[1], 10), -100, 100);
-          store.moods[userKey] = {
-            value: next,
-            updatedAt: Date.now(),
-          };
-          await persistStore();
+          await withMoodLock(userKey, async () => {
+            const store = await ensureStoreLoaded();
+            store.moods[userKey] = {
+              value: next,
+              updatedAt: Date.now(),
+            };
+            await persistStore();
+          });
           return { text: `mood set to ${next}` };
         }
 
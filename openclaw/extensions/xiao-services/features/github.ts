@@ -6,6 +6,7 @@
 import { fetchJsonByCurl, fetchTextByCurl, fetchJson } from "../../shared/request.js";
 import { errToString, clamp } from "../../shared/text.js";
 import { env, envAny } from "../../shared/env.js";
+import { createTtlCache } from "../../shared/cache.js";
 
 export type GithubTrendingItem = {
     repo: string;
@@ -18,16 +19,36 @@ export type GithubTrendingItem = {
     source: "trending_html" | "search_api";
 };
 
+// 趋势页每行要清洗好几个字段：标签、实体、空白各用一个预编译正则，实体查表一次替换完
+const TAG_RE = /<[^>]+>/g;
+const ENTITY_RE = /&(?:amp|lt|gt|quot|#39|nbsp);/g;
+const WHITESPACE_RE = /\s+/g;
+const ENTITY_MAP: Record<string, string> = {
+    "&amp;": "&",
+    "&lt;": "<",
+    "&gt;": ">",
+    "&quot;": "\"",
+    "&#39;": "'",
+    "&nbsp;": " ",
+};
+
+const TRENDING_ARTICLE_RE = /<article[\s\S]*?<\/article>/g;
+// 每行字段的提取正则在模块加载时编译一次，所有行复用
+const TRENDING_REPO_RE = /<h2[\s\S]*?<a[^>]*href="\/([^"?#]+)"/i;
+const TRENDING_DESC_RE = /<p[^>]*>([\s\S]*?)<\/p>/i;
+const TRENDING_LANG_RE = /itemprop="programmingLanguage"[^>]*>([\s\S]*?)<\/span>/i;
+const TRENDING_STARS_TOTAL_RE = /href="\/[^"?#]+\/stargazers"[^>]*>\s*([\d,]+)\s*<\/a>/i;
+const TRENDING_STARS_PERIOD_RE = /([\d,]+)\s+stars?\s+(today|this week|this month)/i;
+
+// 趋势榜一小时内变化不大，抓一次要走代理 + 最长 35s 的 curl；同一 since/language/limit 的结果短时间复用
+const TRENDING_CACHE_TTL_MS = 15 * 60 * 1000;
+const TRENDING_CACHE = createTtlCache<GithubTrendingItem[]>(64, TRENDING_CACHE_TTL_MS);
+
 function cleanText(input: string, maxLen: number = 260): string {
     const text = (input || "")
-        .replace(/<[^>]+>/g, " ")
-        .replace(/&amp;/g, "&")
-        .replace(/&lt;/g, "<")
-        .replace(/&gt;/g, ">")
-        .replace(/&quot;/g, "\"")
-        .replace(/&#39;/g, "'")
-        .replace(/&nbsp;/g, " ")
-        .replace(/\s+/g, " ")
+        .replace(TAG_RE, " ")
+        .replace(ENTITY_RE, (m) => ENTITY_MAP[m] || m)
+        .replace(WHITESPACE_RE, " ")
         .trim();
     if (text.length <= maxLen) {
         return text;
@@ -121,6 +142,24 @@ export async function fetchGithubTrending(params: {
     const since = params.since;
     const language = (params.language || "").trim().toLowerCase();
     const limit = clamp(params.limit, 1, 20);
+    const cacheKey = `${since}|${language}|${limit}`;
+    const cached = TRENDING_CACHE.get(cacheKey);
+    if (cached) {
+        return cached;
+    }
+
+    const items = await fetchGithubTrendingUncached(since, language, limit);
+    if (items.length > 0) {
+        TRENDING_CACHE.set(cacheKey, items);
+    }
+    return items;
+}
+
+async function fetchGithubTrendingUncached(
+    since: "daily" | "weekly" | "monthly",
+    language: string,
+    limit: number,
+): Promise<GithubTrendingItem[]> {
     const langPath = language ? `/${encodeURIComponent(language)}` : "";
     const url = `https://github.com/trending${langPath}?since=${since}`;
 
@@ -148,30 +187,37 @@ export async function fetchGithubTrending(params: {
             },
         });
 
-        const articleRegex = /<article[\s\S]*?<\/article>/g;
-        const rows = (html.match(articleRegex) || [])
-            .filter((row) => /Box-row/.test(row))
-            .slice(0, Math.max(limit * 3, 20));
-
+        // 逐个迭代 <article>，不先把整页所有行切成数组；凑够条数或扫满行数上限就停，不再扫剩余 HTML
+        const maxRows = Math.max(limit * 3, 20);
+        let scannedRows = 0;
         const out: GithubTrendingItem[] = [];
         const seen = new Set<string>();
-        for (const row of rows) {
-            const repoMatch = row.match(/<h2[\s\S]*?<a[^>]*href="\/([^"?#]+)"/i);
+        for (const articleMatch of html.matchAll(TRENDING_ARTICLE_RE)) {
+            const row = articleMatch[0];
+            if (!row.includes("Box-row")) {
+                continue;
+            }
+            scannedRows += 1;
+            if (scannedRows > maxRows) {
+                break;
+            }
+
+            const repoMatch = row.match(TRENDING_REPO_RE);
             const repo = cleanText(repoMatch?.[1] || "", 120).replace(/\s+/g, "");
             if (!repo || !repo.includes("/") || seen.has(repo)) {
                 continue;
             }
 
-            const descMatch = row.match(/<p[^>]*>([\s\S]*?)<\/p>/i);
+            const descMatch = row.match(TRENDING_DESC_RE);
             const description = cleanText(descMatch?.[1] || "", 260);
 
-            const langMatch = row.match(/itemprop="programmingLanguage"[^>]*>([\s\S]*?)<\/span>/i);
+            const langMatch = row.match(TRENDING_LANG_RE);
             const repoLang = cleanText(langMatch?.[1] || "", 60);
 
-            const starTotalMatch = row.match(/href="\/[^"?#]+\/stargazers"[^>]*>\s*([\d,]+)\s*<\/a>/i);
+            const starTotalMatch = row.match(TRENDING_STARS_TOTAL_RE);
             const starsTotal = starTotalMatch?.[1] ? Number(starTotalMatch[1].replace(/,/g, "")) : null;
 
-            const starPeriodMatch = row.match(/([\d,]+)\s+stars?\s+(today|this week|this month)/i);
+            const starPeriodMatch = row.match(TRENDING_STARS_PERIOD_RE);
             const starsPeriod = starPeriodMatch?.[1] ? Number(starPeriodMatch[1].replace(/,/g, "")) : null;
 
             seen.add(repo);
@@ -1,8 +1,7 @@
 import { promises as fs } from "node:fs";
 import path from "node:path";
-import { env } from "../../shared/env.js";
 import { clamp } from "../../shared/text.js";
-import { fetchBytes } from "../../shared/request.js";
+import { fetchBytes, mediaMaxBytes } from "../../shared/request.js";
 
 export function extFromMime(mimeType: string): string {
     const mime = (mimeType || "").toLowerCase();
@@ -28,12 +27,6 @@ export function mimeFromPath(filePath: string): string {
     return "application/octet-stream";
 }
 
-export function mediaMaxBytes(): number {
-    const mbRaw = env("XIAO_MEDIA_MAX_MB") || "20";
-    const mb = clamp(Number(mbRaw), 1, 200);
-    return Math.trunc(mb * 1024 * 1024);
-}
-
 export function parseBase64AudioInput(input: string): {
     bytes: Uint8Array;
     mimeType: string;
@@ -2,6 +2,7 @@ import { randomUUID } from "node:crypto";
 import { promises as fs } from "node:fs";
 import { homedir } from "node:os";
 import path from "node:path";
+import { env } from "../../shared/env.js";
 
 export type ObsMetric = {
     ts: string;
@@ -25,13 +26,17 @@ export function jsonResult(payload: unknown): ToolResult {
 }
 
 export function resolveObsFilePath(): string {
-    const fromEnv = (process.env.XIAO_OBS_FILE || "").trim();
+    const fromEnv = env("XIAO_OBS_FILE");
     if (fromEnv) {
         return fromEnv;
     }
     return path.join(homedir(), ".openclaw", "xiao-core", "observability.jsonl");
 }
 
+export function isObsEnabled(): boolean {
+    return env("XIAO_OBS_ENABLED").toLowerCase() !== "false";
+}
+
 export function resolveObsUserKey(params: unknown): string {
     const p = (params || {}) as Record<string, unknown>;
     const raw =
@@ -45,27 +50,39 @@ export function resolveObsUserKey(params: unknown): string {
     return raw.slice(0, 160);
 }
 
+// Directories already created for the metrics file; mkdir runs once per path, not per tool call.
+const OBS_DIRS_READY = new Set<string>();
+
 export async function writeObsMetric(metric: ObsMetric): Promise<void> {
+    const file = resolveObsFilePath();
+    const dir = path.dirname(file);
     try {
-        const file = resolveObsFilePath();
-        await fs.mkdir(path.dirname(file), { recursive: true });
+        if (!OBS_DIRS_READY.has(dir)) {
+            await fs.mkdir(dir, { recursive: true });
+            OBS_DIRS_READY.add(dir);
+        }
         await fs.appendFile(file, `${JSON.stringify(metric)}\n`, "utf8");
     } catch {
-        // best effort metrics logging
+        // best effort metrics logging; re-check the directory next time
+        OBS_DIRS_READY.delete(dir);
     }
 }
 
 export async function obsWrap(toolName: string, userKey: string, startedAt: number, payload: unknown): Promise<ToolResult> {
-    const obj = (payload || {}) as Record<string, unknown>;
-    const errorCode =
-        obj && obj.ok === false ? String(obj.error || "tool_error").slice(0, 120) : "";
-    await writeObsMetric({
-        ts: new Date().toISOString(),
-        request_id: randomUUID(),
-        user_key: userKey || "unknown",
-        tool_name: toolName,
-        latency_ms: Math.max(0, Date.now() - startedAt),
-        error_code: errorCode,
-    });
+    // Metrics disabled: skip building the record (uuid, timestamp, JSON) entirely.
+    // When enabled, the append is not awaited: the tool result never waits on metrics disk I/O.
+    if (isObsEnabled()) {
+        const obj = (payload || {}) as Record<string, unknown>;
+        const errorCode =
+            obj && obj.ok === false ? String(obj.error || "tool_error").slice(0, 120) : "";
+        void writeObsMetric({
+            ts: new Date().toISOString(),
+            request_id: randomUUID(),
+            user_key: userKey || "unknown",
+            tool_name: toolName,
+            latency_ms: Math.max(0, Date.now() - startedAt),
+            error_code: errorCode,
+        });
+    }
     return jsonResult(payload);
 }
@@ -0,0 +1,83 @@
+import { performance } from "node:perf_hooks";
+import { env } from "../../shared/env.js";
+
+type TokenBucket = {
+    tokens: number;
+    refilledAt: number;
+};
+
+const MAX_BUCKETS = 10000;
+const BUCKETS = new Map<string, TokenBucket>();
+
+function envPositive(name: string, fallback: number): number {
+    const n = Number(env(name) || fallback);
+    return Number.isFinite(n) && n > 0 ? n : fallback;
+}
+
+export function mediaRateLimit(): { burst: number; perMinute: number } {
+    return {
+        burst: envPositive("XIAO_MEDIA_RATE_BURST", 4),
+        perMinute: envPositive("XIAO_MEDIA_RATE_PER_MIN", 20),
+    };
+}
+
+// One bucket per tool shared by everyone, charged on every call, so its defaults are sized for
+// the whole bot rather than for a single user.
+export function mediaGlobalRateLimit(): { burst: number; perMinute: number } {
+    return {
+        burst: envPositive("XIAO_MEDIA_GLOBAL_RATE_BURST", 12),
+        perMinute: envPositive("XIAO_MEDIA_GLOBAL_RATE_PER_MIN", 60),
+    };
+}
+
+// Token bucket on the monotonic clock: allows short bursts, caps the steady rate per key.
+export function takeRateToken(key: string, burst: number, perMinute: number): boolean {
+    const now = performance.now();
+    const prev = BUCKETS.get(key);
+    let tokens = burst;
+    if (prev) {
+        tokens = Math.min(burst, prev.tokens + ((now - prev.refilledAt) / 60000) * perMinute);
+        BUCKETS.delete(key);
+    }
+
+    const allowed = tokens >= 1;
+    BUCKETS.set(key, { tokens: allowed ? tokens - 1 : tokens, refilledAt: now });
+    while (BUCKETS.size > MAX_BUCKETS) {
+        const oldest = BUCKETS.keys().next().value;
+        if (oldest === undefined) break;
+        BUCKETS.delete(oldest);
+    }
+    return allowed;
+}
+
+// Gives back a token taken by takeRateToken when a later check rejected the same call.
+function refundRateToken(key: string, burst: number): void {
+    const bucket = BUCKETS.get(key);
+    if (bucket) {
+        bucket.tokens = Math.min(burst, bucket.tokens + 1);
+    }
+}
+
+// The user key is a tool argument filled in by the model, so it cannot be trusted on its own:
+// a fresh key per call would otherwise get a fresh burst every time. Every call is therefore
+// charged to the tool's global bucket first, and only then to the per-user bucket. Checking the
+// global bucket first also means made-up keys can only create new buckets at the global rate,
+// so they cannot flood the map and evict real users' buckets.
+export function takeMediaRateToken(toolName: string, userKey: string): boolean {
+    const global = mediaGlobalRateLimit();
+    const globalKey = `${toolName}:*`;
+    if (!takeRateToken(globalKey, global.burst, global.perMinute)) {
+        return false;
+    }
+    const user = (userKey || "").trim();
+    if (!user || user === "unknown") {
+        return true;
+    }
+    const { burst, perMinute } = mediaRateLimit();
+    if (takeRateToken(`${toolName}:${user}`, burst, perMinute)) {
+        return true;
+    }
+    // A user over their own limit should not also drain the shared budget.
+    refundRateToken(globalKey, global.burst);
+    return false;
+}
@@ -78,7 +78,7 @@ export async function fetchStockEastmoney(normalized: NormalizedStock): Promise<
     };
 }
 
-export async function fetchStockSina(normalized: NormalizedStock): Promise<StockQuoteResult> {
+export async function fetchStockSina(normalized: NormalizedStock, signal?: AbortSignal): Promise<StockQuoteResult> {
     const symbol = `${normalized.market.toLowerCase()}${normalized.code}`;
     const url = `https://hq.sinajs.cn/list=${encodeURIComponent(symbol)}`;
     const res = await fetch(url, {
@@ -87,7 +87,7 @@ export async function fetchStockSina(normalized: NormalizedStock): Promise<Stock
             "User-Agent": "Mozilla/5.0",
             Referer: "https://finance.sina.com.cn/",
         },
-        signal: AbortSignal.timeout(8000),
+        signal: signal ? AbortSignal.any([signal, AbortSignal.timeout(8000)]) : AbortSignal.timeout(8000),
     });
     const rawBody = new Uint8Array(await res.arrayBuffer());
     let body = "";
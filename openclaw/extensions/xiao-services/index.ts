@@ -9,11 +9,12 @@ import { promisify } from "node:util";
 
 import { env, envAny } from "../shared/env.js";
 import { errToString, clamp } from "../shared/text.js";
-import { fetchJson, fetchJsonByCurl, fetchTextByCurl } from "../shared/request.js";
+import { fetchJson, fetchJsonByCurl, fetchTextByCurl, htmlMaxBytes, readTextCapped } from "../shared/request.js";
 import { assertAllowedChannel, getPrimaryChannel } from "../shared/channel.js";
+import { createTtlCache } from "../shared/cache.js";
 
 // Feature modules
-import { normalizeStockSymbol, fetchStockEastmoney, fetchStockSina } from "./features/stock.js";
+import { normalizeStockSymbol, fetchStockEastmoney, fetchStockSina, type StockQuoteResult } from "./features/stock.js";
 import { fetchGithubTrending } from "./features/github.js";
 import { callAsrOpenAICompat, callTtsOpenAICompat } from "./features/openai.js";
 import { callAsrDashscopeAigc, callTtsDashscopeAigc } from "./features/dashscope.js";
@@ -23,6 +24,7 @@ import { resolveMusic } from "./features/music.js";
 import { recommendMovies } from "./features/movie.js";
 import { searchRestaurants } from "./features/restaurant.js";
 import { trackExpress } from "./features/express.js";
+import { takeMediaRateToken } from "./features/ratelimit.js";
 
 const execFileAsync = promisify(execFile);
 
@@ -106,58 +108,149 @@ function buildVisionPrompt(prompt?: string): string {
   return `${base}\n用户补充要求：${custom}`;
 }
 
+type VisionAnalysis = {
+  image: Awaited<ReturnType<typeof resolveVisionImageInput>>;
+  content: string;
+};
+
+async function runVisionAnalysis(
+  apiKey: string,
+  baseUrl: string,
+  model: string,
+  imageUrl: string,
+  prompt: string,
+  timeoutMs: number,
+): Promise<VisionAnalysis> {
+  // 下载图片和模型调用共用一个总时限：下载最多占 70%，模型只拿剩余时间（至少 8 秒），整次调用不会拖到两倍超时。
+  const deadline = Date.now() + timeoutMs;
+  const image = await resolveVisionImageInput(imageUrl, timeoutMs);
+  const body = {
+    model,
+    messages: [
+      {
+        role: "user",
+        content: [
+          { type: "text", text: prompt },
+          { type: "image_url", image_url: { url: image.imageRef } },
+        ],
+      },
+    ],
+    max_tokens: 300,
+    temperature: 0.4,
+  };
+
+  const data = (await fetchJson(
+    `${baseUrl}/chat/completions`,
+    {
+      method: "POST",
+      headers: {
+        Authorization: `Bearer ${apiKey}`,
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify(body),
+    },
+    Math.max(8000, deadline - Date.now()),
+  )) as {
+    choices?: Array<{ message?: { content?: string } }>;
+  };
+  return { image, content: data.choices?.[0]?.message?.content || "" };
+}
+
+// 同一张图配同一个问题（模型重复调用、用户连发）在识别期间只请求一次模型，后来的调用直接等同一个结果。
+const VISION_INFLIGHT = new Map<string, Promise<VisionAnalysis>>();
+
+function runVisionAnalysisShared(
+  apiKey: string,
+  baseUrl: string,
+  model: string,
+  imageUrl: string,
+  prompt: string,
+  timeoutMs: number,
+): Promise<VisionAnalysis> {
+  const key = `${model}|${prompt}|${imageUrl}`;
+  let pending = VISION_INFLIGHT.get(key);
+  if (!pending) {
+    pending = runVisionAnalysis(apiKey, baseUrl, model, imageUrl, prompt, timeoutMs).finally(() => {
+      VISION_INFLIGHT.delete(key);
+    });
+    VISION_INFLIGHT.set(key, pending);
+  }
+  return pending;
+}
+
+let ttsTempDirReady: Promise<string> | null = null;
+
+// 临时目录只需创建一次；首次调用时与 TTS 请求并行完成，不占合成链路的时间。
+function ensureTtsTempDir(): Promise<string> {
+  if (!ttsTempDirReady) {
+    const dir = path.join(tmpdir(), "openclaw-xiao-services");
+    ttsTempDirReady = fs.mkdir(dir, { recursive: true }).then(
+      () => dir,
+      (err) => {
+        ttsTempDirReady = null;
+        throw err;
+      },
+    );
+  }
+  return ttsTempDirReady;
+}
+
 async function writeTempAudioFile(bytes: Uint8Array, ext: string): Promise<string> {
-  const dir = path.join(tmpdir(), "openclaw-xiao-services");
-  await fs.mkdir(dir, { recursive: true });
+  const dir = await ensureTtsTempDir();
   const filePath = path.join(dir, `tts-${Date.now()}-${randomUUID()}.${ext}`);
   await fs.writeFile(filePath, Buffer.from(bytes));
   return filePath;
 }
 
+const WEATHER_CODE_TEXT: Record<number, string> = {
+  0: "Clear",
+  1: "Mainly clear",
+  2: "Partly cloudy",
+  3: "Overcast",
+  45: "Fog",
+  48: "Depositing rime fog",
+  51: "Light drizzle",
+  53: "Moderate drizzle",
+  55: "Dense drizzle",
+  61: "Slight rain",
+  63: "Moderate rain",
+  65: "Heavy rain",
+  71: "Slight snow",
+  73: "Moderate snow",
+  75: "Heavy snow",
+  80: "Rain showers",
+  81: "Moderate rain showers",
+  82: "Violent rain showers",
+  95: "Thunderstorm",
+};
+
 function weatherCodeToText(code: unknown): string {
   const n = Number(code);
-  const mapping: Record<number, string> = {
-    0: "Clear",
-    1: "Mainly clear",
-    2: "Partly cloudy",
-    3: "Overcast",
-    45: "Fog",
-    48: "Depositing rime fog",
-    51: "Light drizzle",
-    53: "Moderate drizzle",
-    55: "Dense drizzle",
-    61: "Slight rain",
-    63: "Moderate rain",
-    65: "Heavy rain",
-    71: "Slight snow",
-    73: "Moderate snow",
-    75: "Heavy snow",
-    80: "Rain showers",
-    81: "Moderate rain showers",
-    82: "Violent rain showers",
-    95: "Thunderstorm",
-  };
-  return Number.isFinite(n) && mapping[n] ? mapping[n] : "Unknown";
+  return Number.isFinite(n) && WEATHER_CODE_TEXT[n] ? WEATHER_CODE_TEXT[n] : "Unknown";
 }
 
+const HTML_ENTITY_MAP: Record<string, string> = {
+  "&amp;": "&",
+  "&lt;": "<",
+  "&gt;": ">",
+  "&quot;": "\"",
+  "&#39;": "'",
+  "&nbsp;": " ",
+};
+
 function decodeHtmlEntities(input: string): string {
-  const map: Record<string, string> = {
-    "&amp;": "&",
-    "&lt;": "<",
-    "&gt;": ">",
-    "&quot;": "\"",
-    "&#39;": "'",
-    "&nbsp;": " ",
-  };
-  return (input || "").replace(/&(amp|lt|gt|quot|#39|nbsp);/g, (m) => map[m] || m);
+  return (input || "").replace(/&(amp|lt|gt|quot|#39|nbsp);/g, (m) => HTML_ENTITY_MAP[m] || m);
 }
 
+const HTML_TAG_RE = /<[^>]+>/g;
+const WHITESPACE_RE = /\s+/g;
+
 function stripHtmlTags(input: string): string {
-  return decodeHtmlEntities((input || "").replace(/<[^>]+>/g, " "));
+  return decodeHtmlEntities((input || "").replace(HTML_TAG_RE, " "));
 }
 
 function cleanText(input: string, maxLen: number = 260): string {
-  const text = stripHtmlTags(input).replace(/\s+/g, " ").trim();
+  const text = stripHtmlTags(input).replace(WHITESPACE_RE, " ").trim();
   if (text.length <= maxLen) {
     return text;
   }
@@ -198,17 +291,14 @@ function pickMetaDescription(html: string): string {
   return "";
 }
 
-function extractReadableFromHtml(html: string, maxChars: number): string {
-  const stripped = (html || "")
-    .replace(/<script[\s\S]*?<\/script>/gi, " ")
-    .replace(/<style[\s\S]*?<\/style>/gi, " ")
-    .replace(/<noscript[\s\S]*?<\/noscript>/gi, " ")
-    .replace(/<svg[\s\S]*?<\/svg>/gi, " ")
-    .replace(/<header[\s\S]*?<\/header>/gi, " ")
-    .replace(/<footer[\s\S]*?<\/footer>/gi, " ")
-    .replace(/<nav[\s\S]*?<\/nav>/gi, " ");
-
-  const plain = cleanText(stripped, Math.max(4000, maxChars * 3));
+// 非正文区块和普通标签合在一个正则里一次扫描剔除：整页 HTML 只过一遍，
+// 而不是先删区块、再删标签各扫一遍，缩短解析时对事件循环的占用。
+const NON_CONTENT_OR_TAG_RE = /<(script|style|noscript|svg|header|footer|nav)\b[\s\S]*?<\/\1>|<[^>]+>/gi;
+
+function extractReadableFromHtml(html: string, maxChars: number): string {
+  const text = decodeHtmlEntities((html || "").replace(NON_CONTENT_OR_TAG_RE, " ")).replace(WHITESPACE_RE, " ").trim();
+  const plainLimit = Math.max(4000, maxChars * 3);
+  const plain = text.length <= plainLimit ? text : `${text.slice(0, plainLimit)}...`;
   if (!plain) {
     return "";
   }
@@ -223,6 +313,37 @@ function extractReadableFromHtml(html: string, maxChars: number): string {
   return cleanText(joined || plain, maxChars);
 }
 
+type UrlDigestContent = {
+  title: string;
+  description: string;
+  preview: string;
+};
+
+// 同一链接常被连续追问/重复总结，解析结果在内存里缓存一段时间，命中时不再抓取网页。
+const URL_DIGEST_CACHE = createTtlCache<UrlDigestContent>(256, () => {
+  const minutes = Number(env("XIAO_URL_DIGEST_CACHE_MIN") || 30);
+  return Number.isFinite(minutes) && minutes > 0 ? minutes * 60 * 1000 : 30 * 60 * 1000;
+});
+// 抓取失败/无正文的链接短时间内记住失败结果，用户重复粘贴时不再重跑 curl+fetch 的超时重试。
+const URL_DIGEST_FAILURES = createTtlCache<string>(256, 3 * 60 * 1000);
+const URL_TRACKING_PARAM_RE = /^(?:utm_\w+|spm|share_\w+|vd_source|xhsshare)$/i;
+
+// 缓存键去掉 #片段和常见追踪参数，同一篇文章换个分享来源也能命中缓存。
+function urlDigestCacheKey(url: string): string {
+  try {
+    const u = new URL(url);
+    u.hash = "";
+    for (const name of [...u.searchParams.keys()]) {
+      if (URL_TRACKING_PARAM_RE.test(name)) {
+        u.searchParams.delete(name);
+      }
+    }
+    return u.toString();
+  } catch {
+    return url;
+  }
+}
+
 function sleepMs(ms: number): Promise<void> {
   return new Promise((resolve) => setTimeout(resolve, ms));
 }
@@ -233,16 +354,20 @@ async function fetchUrlDigestHtml(url: string, timeoutSec: number): Promise<stri
       "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
     Accept: "text/html,application/xhtml+xml",
   };
+  // 只解析页面前一段，超大页面截断后再交给正则提取，避免整页进内存反复扫描。
+  const maxBytes = htmlMaxBytes();
   let lastErr: unknown = null;
 
   for (let attempt = 1; attempt <= 2; attempt += 1) {
     try {
-      return await fetchTextByCurl({
+      const html = await fetchTextByCurl({
         url,
         timeoutSec,
         compressed: true,
         headers,
+        maxBytes,
       });
+      return html;
     } catch (err) {
       lastErr = err;
       if (attempt < 2) {
@@ -260,58 +385,152 @@ async function fetchUrlDigestHtml(url: string, timeoutSec: number): Promise<stri
     if (!res.ok) {
       throw new Error(`HTTP ${res.status}`);
     }
-    return await res.text();
+    return await readTextCapped(res, maxBytes);
   } catch (fallbackErr) {
     throw new Error(`url_fetch_failed: curl=${errToString(lastErr)}; fetch=${errToString(fallbackErr)}`);
   }
 }
 
-type ProbeStatus = "ok" | "fail" | "skip";
-async function runServiceProbe(): Promise<{
-  summary: { ok: number; fail: number; skip: number };
-  checks: Array<{ name: string; status: ProbeStatus; detail: string }>;
-}> {
-  const checks: Array<{ name: string; status: ProbeStatus; detail: string }> = [];
+async function buildUrlDigest(url: string, maxChars: number): Promise<UrlDigestContent> {
+  const html = await fetchUrlDigestHtml(url, 25);
+  return {
+    title: cleanText((html.match(/<title[^>]*>([\s\S]*?)<\/title>/i)?.[1] || "").trim(), 220),
+    description: pickMetaDescription(html),
+    preview: extractReadableFromHtml(html, maxChars),
+  };
+}
+
+// 同一链接的并发请求（用户连发、模型重复调用）共用一次抓取，不各自跑一遍 curl。
+const URL_DIGEST_INFLIGHT = new Map<string, Promise<UrlDigestContent>>();
+
+function loadUrlDigestShared(cacheKey: string, url: string, maxChars: number): Promise<UrlDigestContent> {
+  let pending = URL_DIGEST_INFLIGHT.get(cacheKey);
+  if (!pending) {
+    pending = buildUrlDigest(url, maxChars).finally(() => {
+      URL_DIGEST_INFLIGHT.delete(cacheKey);
+    });
+    URL_DIGEST_INFLIGHT.set(cacheKey, pending);
+  }
+  return pending;
+}
+
+type SearchResultItem = { title: string; href: string; body: string };
+type GoogleCseOutcome = { ok: true; results: SearchResultItem[] } | { ok: false; detail: string };
+
+// 同一问题常在几分钟内被反复搜索（多人问同一条新闻、模型重复调用），结果短时间缓存，并发的相同查询共用一次请求。
+const SEARCH_CACHE = createTtlCache<SearchResultItem[]>(256, 5 * 60 * 1000);
+const SEARCH_INFLIGHT = new Map<string, Promise<GoogleCseOutcome>>();
+
+function searchCacheKey(query: string, maxResults: number): string {
+  return `${maxResults}|${query.toLowerCase().replace(WHITESPACE_RE, " ")}`;
+}
 
+async function fetchGoogleCse(apiKey: string, cx: string, query: string, maxResults: number): Promise<GoogleCseOutcome> {
+  const url = new URL("https://www.googleapis.com/customsearch/v1");
+  url.searchParams.set("key", apiKey);
+  url.searchParams.set("cx", cx);
+  url.searchParams.set("q", query);
+  url.searchParams.set("num", String(maxResults));
+  url.searchParams.set("fields", "items(title,link,snippet)");
+  const proxy = envAny([
+    "GOOGLE_CSE_PROXY",
+    "HTTPS_PROXY",
+    "HTTP_PROXY",
+    "https_proxy",
+    "http_proxy",
+    "ALL_PROXY",
+    "all_proxy",
+  ]);
+  const data = (await fetchJsonByCurl({
+    url: url.toString(),
+    timeoutSec: 25,
+    proxy: proxy || undefined,
+  })) as {
+    items?: Array<{ title?: string; link?: string; snippet?: string }>;
+    error?: unknown;
+  };
+  if (data.error) {
+    return { ok: false, detail: JSON.stringify(data.error).slice(0, 280) };
+  }
+  const items = Array.isArray(data.items) ? data.items : [];
+  return {
+    ok: true,
+    results: items.map((it) => ({
+      title: String(it.title || "").trim(),
+      href: String(it.link || "").trim(),
+      body: String(it.snippet || "").trim(),
+    })),
+  };
+}
+
+function searchGoogleCseShared(apiKey: string, cx: string, query: string, maxResults: number): Promise<GoogleCseOutcome> {
+  const cacheKey = searchCacheKey(query, maxResults);
+  const cached = SEARCH_CACHE.get(cacheKey);
+  if (cached) {
+    return Promise.resolve({ ok: true, results: cached });
+  }
+  let pending = SEARCH_INFLIGHT.get(cacheKey);
+  if (!pending) {
+    // 只缓存成功结果，API 报错或网络异常下一次照常重试。
+    pending = fetchGoogleCse(apiKey, cx, query, maxResults)
+      .then((outcome) => {
+        if (outcome.ok) {
+          SEARCH_CACHE.set(cacheKey, outcome.results);
+        }
+        return outcome;
+      })
+      .finally(() => {
+        SEARCH_INFLIGHT.delete(cacheKey);
+      });
+    SEARCH_INFLIGHT.set(cacheKey, pending);
+  }
+  return pending;
+}
+
+type ProbeStatus = "ok" | "fail" | "skip";
+type ProbeCheck = { name: string; status: ProbeStatus; detail: string };
+
+async function probeGoogleCse(): Promise<ProbeCheck> {
   const googleKey = env("GOOGLE_CSE_API_KEY");
   const googleCx = env("GOOGLE_CSE_CX");
   if (!googleKey || !googleCx) {
-    checks.push({
+    return {
       name: "google_cse",
       status: "skip",
       detail: "Missing GOOGLE_CSE_API_KEY or GOOGLE_CSE_CX",
-    });
-  } else {
-    try {
-      const url = new URL("https://www.googleapis.com/customsearch/v1");
-      url.searchParams.set("key", googleKey);
-      url.searchParams.set("cx", googleCx);
-      url.searchParams.set("q", "OpenClaw");
-      url.searchParams.set("num", "1");
-      const proxy = envAny([
-        "GOOGLE_CSE_PROXY",
-        "HTTPS_PROXY",
-        "HTTP_PROXY",
-        "https_proxy",
-        "http_proxy",
-        "ALL_PROXY",
-        "all_proxy",
-      ]);
-      const data = (await fetchJsonByCurl({
-        url: url.toString(),
-        timeoutSec: 20,
-        proxy: proxy || undefined,
-      })) as { items?: unknown[]; error?: unknown };
-      if (data.error) {
-        throw new Error(`google api error: ${JSON.stringify(data.error).slice(0, 220)}`);
-      }
-      const count = Array.isArray(data.items) ? data.items.length : 0;
-      checks.push({ name: "google_cse", status: "ok", detail: `items=${count}` });
-    } catch (err) {
-      checks.push({ name: "google_cse", status: "fail", detail: errToString(err) });
+    };
+  }
+  try {
+    const url = new URL("https://www.googleapis.com/customsearch/v1");
+    url.searchParams.set("key", googleKey);
+    url.searchParams.set("cx", googleCx);
+    url.searchParams.set("q", "OpenClaw");
+    url.searchParams.set("num", "1");
+    const proxy = envAny([
+      "GOOGLE_CSE_PROXY",
+      "HTTPS_PROXY",
+      "HTTP_PROXY",
+      "https_proxy",
+      "http_proxy",
+      "ALL_PROXY",
+      "all_proxy",
+    ]);
+    const data = (await fetchJsonByCurl({
+      url: url.toString(),
+      timeoutSec: 20,
+      proxy: proxy || undefined,
+    })) as { items?: unknown[]; error?: unknown };
+    if (data.error) {
+      throw new Error(`google api error: ${JSON.stringify(data.error).slice(0, 220)}`);
     }
+    const count = Array.isArray(data.items) ? data.items.length : 0;
+    return { name: "google_cse", status: "ok", detail: `items=${count}` };
+  } catch (err) {
+    return { name: "google_cse", status: "fail", detail: errToString(err) };
   }
+}
 
+async function probeOpenMeteo(): Promise<ProbeCheck> {
   try {
     const geoUrl = new URL("https://geocoding-api.open-meteo.com/v1/search");
     geoUrl.searchParams.set("name", "Mianyang");
@@ -322,11 +541,13 @@ async function runServiceProbe(): Promise<{
     if (!Array.isArray(geo.results) || geo.results.length === 0) {
       throw new Error("no geocoding result");
     }
-    checks.push({ name: "open_meteo", status: "ok", detail: "geocoding reachable" });
+    return { name: "open_meteo", status: "ok", detail: "geocoding reachable" };
   } catch (err) {
-    checks.push({ name: "open_meteo", status: "fail", detail: errToString(err) });
+    return { name: "open_meteo", status: "fail", detail: errToString(err) };
   }
+}
 
+async function probeStockQuote(): Promise<ProbeCheck> {
   try {
     const normalized = normalizeStockSymbol("600519");
     if (!normalized) {
@@ -334,58 +555,75 @@ async function runServiceProbe(): Promise<{
     }
     try {
       const quote = await fetchStockEastmoney(normalized);
-      checks.push({
+      return {
         name: "stock_quote",
         status: "ok",
         detail: `${quote.provider} price=${quote.quote.price}`,
-      });
+      };
     } catch (eastmoneyErr) {
       const fallback = await fetchStockSina(normalized);
-      checks.push({
+      return {
         name: "stock_quote",
         status: "ok",
         detail: `${fallback.provider} fallback price=${fallback.quote.price}; primary_error=${errToString(eastmoneyErr)}`,
-      });
+      };
     }
   } catch (err) {
-    checks.push({ name: "stock_quote", status: "fail", detail: errToString(err) });
+    return { name: "stock_quote", status: "fail", detail: errToString(err) };
   }
+}
 
+async function probeGithubTrending(): Promise<ProbeCheck> {
   try {
     const items = await fetchGithubTrending({ since: "weekly", limit: 1 });
     if (!items.length) {
       throw new Error("empty weekly trending result");
     }
-    checks.push({
+    return {
       name: "github_trending",
       status: "ok",
       detail: `${items[0].repo} stars_period=${items[0].starsPeriod ?? "-"}`,
-    });
+    };
   } catch (err) {
-    checks.push({ name: "github_trending", status: "fail", detail: errToString(err) });
+    return { name: "github_trending", status: "fail", detail: errToString(err) };
   }
+}
 
+async function probeDashscope(): Promise<ProbeCheck> {
   const dashscopeKey = env("DASHSCOPE_API_KEY");
   if (!dashscopeKey) {
-    checks.push({ name: "dashscope", status: "skip", detail: "Missing DASHSCOPE_API_KEY" });
-  } else {
-    try {
-      const baseUrl = env("DASHSCOPE_BASE_URL") || "https://dashscope.aliyuncs.com/compatible-mode/v1";
-      await fetchJson(
-        `${baseUrl.replace(/\/$/, "")}/models`,
-        {
-          method: "GET",
-          headers: {
-            Authorization: `Bearer ${dashscopeKey}`,
-          },
+    return { name: "dashscope", status: "skip", detail: "Missing DASHSCOPE_API_KEY" };
+  }
+  try {
+    const baseUrl = env("DASHSCOPE_BASE_URL") || "https://dashscope.aliyuncs.com/compatible-mode/v1";
+    await fetchJson(
+      `${baseUrl.replace(/\/$/, "")}/models`,
+      {
+        method: "GET",
+        headers: {
+          Authorization: `Bearer ${dashscopeKey}`,
         },
-        10000,
-      );
-      checks.push({ name: "dashscope", status: "ok", detail: "model endpoint reachable" });
-    } catch (err) {
-      checks.push({ name: "dashscope", status: "fail", detail: errToString(err) });
-    }
+      },
+      10000,
+    );
+    return { name: "dashscope", status: "ok", detail: "model endpoint reachable" };
+  } catch (err) {
+    return { name: "dashscope", status: "fail", detail: errToString(err) };
   }
+}
+
+// 各项探测互不依赖且各自兜底异常，一次性并发发出，总耗时取决于最慢的一项而不是逐项相加
+async function runServiceProbe(): Promise<{
+  summary: { ok: number; fail: number; skip: number };
+  checks: ProbeCheck[];
+}> {
+  const checks = await Promise.all([
+    probeGoogleCse(),
+    probeOpenMeteo(),
+    probeStockQuote(),
+    probeGithubTrending(),
+    probeDashscope(),
+  ]);
 
   const ok = checks.filter((x) => x.status === "ok").length;
   const fail = checks.filter((x) => x.status === "fail").length;
@@ -431,6 +669,10 @@ const stockSchema = {
   },
 } as const;
 
+const GITHUB_TRENDING_SINCE = new Set(["daily", "weekly", "monthly"]);
+// 东财多数在 1 秒内返回；超过这个时间还没结果才补发新浪兜底请求。
+const STOCK_HEDGE_DELAY_MS = 1500;
+
 const githubTrendingSchema = {
   type: "object",
   additionalProperties: false,
@@ -460,6 +702,7 @@ const visionSchema = {
   properties: {
     imageUrl: { type: "string", description: "Image URL to analyze" },
     prompt: { type: "string", description: "Optional analysis prompt" },
+    userKey: { type: "string", description: "Caller user_key (see XIAO_EMOTION_CONTEXT), used for per-user rate limiting" },
   },
 } as const;
 
@@ -473,6 +716,7 @@ const asrSchema = {
     model: { type: "string", description: "ASR model override" },
     language: { type: "string", description: "Optional language hint" },
     prompt: { type: "string", description: "Optional transcription prompt" },
+    userKey: { type: "string", description: "Caller user_key (see XIAO_EMOTION_CONTEXT), used for per-user rate limiting" },
   },
 } as const;
 
@@ -494,6 +738,7 @@ const ttsSchema = {
     pitch: { type: "number", minimum: 0.5, maximum: 2.0, description: "Pitch multiplier (0.5-2.0)" },
     volume: { type: "number", minimum: 0.5, maximum: 2.0, description: "Volume multiplier (0.5-2.0)" },
     returnBase64: { type: "boolean", description: "Include full base64 in output" },
+    userKey: { type: "string", description: "Caller user_key (see XIAO_EMOTION_CONTEXT), used for per-user rate limiting" },
   },
 } as const;
 
@@ -588,46 +833,19 @@ const xiaoServicesPlugin = {
         }
 
         try {
-          const url = new URL("https://www.googleapis.com/customsearch/v1");
-          url.searchParams.set("key", apiKey);
-          url.searchParams.set("cx", cx);
-          url.searchParams.set("q", query);
-          url.searchParams.set("num", String(maxResults));
-          url.searchParams.set("fields", "items(title,link,snippet)");
-          const proxy = envAny([
-            "GOOGLE_CSE_PROXY",
-            "HTTPS_PROXY",
-            "HTTP_PROXY",
-            "https_proxy",
-            "http_proxy",
-            "ALL_PROXY",
-            "all_proxy",
-          ]);
-          const data = (await fetchJsonByCurl({
-            url: url.toString(),
-            timeoutSec: 25,
-            proxy: proxy || undefined,
-          })) as {
-            items?: Array<{ title?: string; link?: string; snippet?: string }>;
-            error?: unknown;
-          };
-          if (data.error) {
+          const outcome = await searchGoogleCseShared(apiKey, cx, query, maxResults);
+          if (!outcome.ok) {
             return jsonResult({
               ok: false,
               error: "google_api_error",
-              detail: JSON.stringify(data.error).slice(0, 280),
+              detail: outcome.detail,
             });
           }
-          const items = Array.isArray(data.items) ? data.items : [];
           return jsonResult({
             ok: true,
             provider: "google_cse",
             query,
-            results: items.map((it) => ({
-              title: String(it.title || "").trim(),
-              href: String(it.link || "").trim(),
-              body: String(it.snippet || "").trim(),
-            })),
+            results: outcome.results,
           });
         } catch (err) {
           return jsonResult({ ok: false, error: errToString(err) });
@@ -740,19 +958,38 @@ const xiaoServicesPlugin = {
           });
         }
 
-        try {
-          const html = await fetchUrlDigestHtml(url, 25);
+        const normalizedUrl = urlDigestCacheKey(url);
+        const failed = URL_DIGEST_FAILURES.get(normalizedUrl);
+        if (failed) {
+          return await obsWrap("xiao_url_digest", obsUser, obsStart, {
+            ok: false,
+            error: failed,
+            url,
+            cached: true,
+          });
+        }
 
-          const title = cleanText((html.match(/<title[^>]*>([\s\S]*?)<\/title>/i)?.[1] || "").trim(), 220);
-          const description = pickMetaDescription(html);
-          const preview = extractReadableFromHtml(html, maxChars);
+        try {
+          const cacheKey = `${maxChars}|${normalizedUrl}`;
+          const cached = URL_DIGEST_CACHE.get(cacheKey);
+          let digest: UrlDigestContent;
+          if (cached) {
+            digest = cached;
+          } else {
+            digest = await loadUrlDigestShared(cacheKey, url, maxChars);
+          }
+          const { title, description, preview } = digest;
           if (!title && !description && !preview) {
+            URL_DIGEST_FAILURES.set(normalizedUrl, "empty_response");
             return await obsWrap("xiao_url_digest", obsUser, obsStart, {
               ok: false,
               error: "empty_response",
               url,
             });
           }
+          if (!cached) {
+            URL_DIGEST_CACHE.set(cacheKey, digest);
+          }
 
           let domain = "";
           try {
@@ -769,9 +1006,11 @@ const xiaoServicesPlugin = {
             description,
             preview,
             maxChars,
+            cached: !!cached,
           });
         } catch (err) {
           const errorCode = classifyToolError(err);
+          URL_DIGEST_FAILURES.set(normalizedUrl, errorCode);
           return await obsWrap("xiao_url_digest", obsUser, obsStart, {
             ok: false,
             error: errorCode,
@@ -896,12 +1135,26 @@ const xiaoServicesPlugin = {
           });
         }
 
+        // 对冲式兜底：东财超过 STOCK_HEDGE_DELAY_MS 还没返回、或直接失败时才发新浪请求；
+        // 东财先拿到有效报价就中止已发出的新浪请求。正常情况只打一个上游，慢的时候最坏耗时也不再是两次超时相加。
+        const sinaAbort = new AbortController();
+        let fallbackTask: Promise<StockQuoteResult> | null = null;
+        const startFallback = (): Promise<StockQuoteResult> => {
+          if (!fallbackTask) {
+            fallbackTask = fetchStockSina(normalized, sinaAbort.signal);
+            // 先挂一个空 catch，被中止或没人 await 时不会冒出未处理的 rejection。
+            fallbackTask.catch(() => undefined);
+          }
+          return fallbackTask;
+        };
+        const hedgeTimer = setTimeout(startFallback, STOCK_HEDGE_DELAY_MS);
         try {
           const primary = await fetchStockEastmoney(normalized);
+          sinaAbort.abort();
           return await obsWrap("xiao_stock_quote", obsUser, obsStart, { ok: true, ...primary });
         } catch (err) {
           try {
-            const fallback = await fetchStockSina(normalized);
+            const fallback = await startFallback();
             return await obsWrap("xiao_stock_quote", obsUser, obsStart, {
               ok: true,
               ...fallback,
@@ -915,6 +1168,8 @@ const xiaoServicesPlugin = {
               fallbackError: errToString(fallbackErr),
             });
           }
+        } finally {
+          clearTimeout(hedgeTimer);
         }
       },
     } as AnyAgentTool);
@@ -931,8 +1186,7 @@ const xiaoServicesPlugin = {
         const obsStart = Date.now();
         const obsUser = resolveObsUserKey(params);
         const since = (params.since || "weekly").trim().toLowerCase();
-        const allowed = new Set(["daily", "weekly", "monthly"]);
-        if (!allowed.has(since)) {
+        if (!GITHUB_TRENDING_SINCE.has(since)) {
           return await obsWrap("xiao_github_trending", obsUser, obsStart, {
             ok: false,
             error: "invalid_since",
@@ -974,7 +1228,7 @@ const xiaoServicesPlugin = {
       label: "Xiao Vision Analyze",
       description: "Analyze an image using Qwen-VL through DashScope compatible API.",
       parameters: visionSchema,
-      async execute(_toolCallId: string, params: { imageUrl?: string; prompt?: string }) {
+      async execute(_toolCallId: string, params: { imageUrl?: string; prompt?: string; userKey?: string }) {
         const obsStart = Date.now();
         const obsUser = resolveObsUserKey(params);
         const imageUrl = (params.imageUrl || "").trim();
@@ -982,7 +1236,6 @@ const xiaoServicesPlugin = {
         if (!imageUrl) {
           return await obsWrap("xiao_vision_analyze", obsUser, obsStart, { ok: false, error: "invalid_input" });
         }
-
         const apiKey = env("DASHSCOPE_API_KEY");
         if (!apiKey) {
           return await obsWrap("xiao_vision_analyze", obsUser, obsStart, {
@@ -992,70 +1245,19 @@ const xiaoServicesPlugin = {
             migration_hint: "Set DASHSCOPE_API_KEY to migrate xiao_a vision capability.",
           });
         }
-
-        const baseUrl = (env("DASHSCOPE_BASE_URL") || "https://dashscope.aliyuncs.com/compatible-mode/v1").replace(/\/$/, "");
-        const model = env("QWEN_VL_MODEL") || "qwen-vl-plus-latest";
-        const timeoutMs = envTimeoutMs("XIAO_VISION_TIMEOUT_MS", 35000);
-        let resolvedImage:
-          | {
-            imageRef: string;
-            source: "data_url" | "downloaded_url";
-            mimeType: string;
-            bytes: number;
-          }
-          | null = null;
-
-        try {
-          resolvedImage = await resolveVisionImageInput(imageUrl, timeoutMs);
-        } catch (err) {
-          const errorCode = classifyToolError(err);
-          return await obsWrap("xiao_vision_analyze", obsUser, obsStart, {
-            ok: false,
-            error: errorCode,
-            errorDetail: errToString(err),
-            fallbackHint: fallbackHintForError("vision", errorCode),
-          });
-        }
-        if (!resolvedImage) {
+        if (!takeMediaRateToken("xiao_vision_analyze", obsUser)) {
           return await obsWrap("xiao_vision_analyze", obsUser, obsStart, {
             ok: false,
-            error: "tool_error",
-            fallbackHint: fallbackHintForError("vision", "tool_error"),
+            error: "rate_limited",
+            fallbackHint: fallbackHintForError("vision", "rate_limited"),
           });
         }
 
+        const baseUrl = (env("DASHSCOPE_BASE_URL") || "https://dashscope.aliyuncs.com/compatible-mode/v1").replace(/\/$/, "");
+        const model = env("QWEN_VL_MODEL") || "qwen-vl-plus-latest";
+        const timeoutMs = envTimeoutMs("XIAO_VISION_TIMEOUT_MS", 35000);
         try {
-          const body = {
-            model,
-            messages: [
-              {
-                role: "user",
-                content: [
-                  { type: "text", text: prompt },
-                  { type: "image_url", image_url: { url: resolvedImage.imageRef } },
-                ],
-              },
-            ],
-            max_tokens: 300,
-            temperature: 0.4,
-          };
-
-          const data = (await fetchJson(
-            `${baseUrl}/chat/completions`,
-            {
-              method: "POST",
-              headers: {
-                Authorization: `Bearer ${apiKey}`,
-                "Content-Type": "application/json",
-              },
-              body: JSON.stringify(body),
-            },
-            timeoutMs,
-          )) as {
-            choices?: Array<{ message?: { content?: string } }>;
-          };
-
-          const content = data.choices?.[0]?.message?.content || "";
+          const { image, content } = await runVisionAnalysisShared(apiKey, baseUrl, model, imageUrl, prompt, timeoutMs);
           if (!content.trim()) {
             return await obsWrap("xiao_vision_analyze", obsUser, obsStart, {
               ok: false,
@@ -1070,9 +1272,9 @@ const xiaoServicesPlugin = {
             model,
             timeoutMs,
             imageMeta: {
-              source: resolvedImage.source,
-              mimeType: resolvedImage.mimeType,
-              bytes: resolvedImage.bytes,
+              source: image.source,
+              mimeType: image.mimeType,
+              bytes: image.bytes,
             },
             content,
           });
@@ -1102,6 +1304,7 @@ const xiaoServicesPlugin = {
           model?: string;
           language?: string;
           prompt?: string;
+          userKey?: string;
         },
       ) {
         const obsStart = Date.now();
@@ -1115,6 +1318,13 @@ const xiaoServicesPlugin = {
             migration_hint: "Set DASHSCOPE_API_KEY to enable ASR migration from xiao_a.",
           });
         }
+        if (!takeMediaRateToken("xiao_asr_transcribe", obsUser)) {
+          return await obsWrap("xiao_asr_transcribe", obsUser, obsStart, {
+            ok: false,
+            error: "rate_limited",
+            fallbackHint: fallbackHintForError("asr", "rate_limited"),
+          });
+        }
 
         const baseUrl = env("DASHSCOPE_BASE_URL") || "https://dashscope.aliyuncs.com/compatible-mode/v1";
         const model = (params.model || "").trim() || env("DASHSCOPE_ASR_MODEL") || "qwen3-asr-flash";
@@ -1222,6 +1432,7 @@ const xiaoServicesPlugin = {
           pitch?: number;
           volume?: number;
           returnBase64?: boolean;
+          userKey?: string;
         },
       ) {
         const obsStart = Date.now();
@@ -1230,7 +1441,6 @@ const xiaoServicesPlugin = {
         if (!text) {
           return await obsWrap("xiao_tts_synthesize", obsUser, obsStart, { ok: false, error: "invalid_input" });
         }
-
         const apiKey = env("DASHSCOPE_API_KEY");
         if (!apiKey) {
           return await obsWrap("xiao_tts_synthesize", obsUser, obsStart, {
@@ -1240,6 +1450,13 @@ const xiaoServicesPlugin = {
             migration_hint: "Set DASHSCOPE_API_KEY to enable TTS migration from xiao_a.",
           });
         }
+        if (!takeMediaRateToken("xiao_tts_synthesize", obsUser)) {
+          return await obsWrap("xiao_tts_synthesize", obsUser, obsStart, {
+            ok: false,
+            error: "rate_limited",
+            fallbackHint: fallbackHintForError("tts", "rate_limited"),
+          });
+        }
 
         const baseUrl = env("DASHSCOPE_BASE_URL") || "https://dashscope.aliyuncs.com/compatible-mode/v1";
         const model = (params.model || "").trim() || env("QWEN_TTS_MODEL") || "qwen-tts-2025-05-22";
@@ -1250,6 +1467,7 @@ const xiaoServicesPlugin = {
         const pitch = normalizeScale(params.pitch ?? (env("QWEN_TTS_PITCH") || 1), 1);
         const volume = normalizeScale(params.volume ?? (env("QWEN_TTS_VOLUME") || 1), 1);
         const instructions = buildTtsInstruction((params.instructions || "").trim() || undefined, rate, pitch, volume);
+        ensureTtsTempDir().catch(() => undefined);
 
         try {
           let spoken: { audioBytes: Uint8Array; mimeType: string };